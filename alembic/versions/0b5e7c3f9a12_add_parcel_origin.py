@@ -0,0 +1,26 @@
+"""Add parcel origin
+
+Revision ID: 0b5e7c3f9a12
+Revises: f2c6a8d41b97
+Create Date: 2026-10-16 15:08:51.370412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b5e7c3f9a12'
+down_revision: Union[str, None] = 'f2c6a8d41b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('parcels', sa.Column('origin', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('parcels', 'origin')
@@ -0,0 +1,30 @@
+"""Store train lines as an indexed array
+
+Revision ID: 5d2a8c41f7b3
+Revises: 3180973d8dcc
+Create Date: 2026-10-16 09:12:04.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a8c41f7b3'
+down_revision: Union[str, None] = '3180973d8dcc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('trains', sa.Column('lines', postgresql.ARRAY(sa.String()), server_default='{}', nullable=False))
+    op.execute("UPDATE trains SET lines = string_to_array(available_lines, ',') WHERE available_lines <> ''")
+    op.create_index('ix_trains_lines', 'trains', ['lines'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trains_lines', table_name='trains', postgresql_using='gin')
+    op.drop_column('trains', 'lines')
@@ -0,0 +1,34 @@
+"""Add departure schedule index
+
+Revision ID: 7d3a9e2b5c48
+Revises: 0b5e7c3f9a12
+Create Date: 2026-10-16 16:21:37.904553
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3a9e2b5c48'
+down_revision: Union[str, None] = '0b5e7c3f9a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_trains_departures', 'trains', ['departure_time', 'id'], unique=False,
+            postgresql_include=['assigned_line'],
+            postgresql_where=sa.text("status = 'BOOKED'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_trains_departures', table_name='trains', postgresql_concurrently=True)
@@ -0,0 +1,56 @@
+"""Add indexes for hot queries
+
+Revision ID: a93e1f06c2d4
+Revises: 5d2a8c41f7b3
+Create Date: 2026-10-16 10:03:51.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93e1f06c2d4'
+down_revision: Union[str, None] = '5d2a8c41f7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_parcels_unassigned', 'parcels', ['destination'], unique=False,
+            postgresql_include=['id', 'weight', 'volume'],
+            postgresql_where=sa.text('train_id IS NULL'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_parcels_owner_active', 'parcels', ['owner_id', 'created_at', 'id'], unique=False,
+            postgresql_where=sa.text('is_active'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_parcels_train_id', 'parcels', ['train_id'], unique=False,
+            postgresql_where=sa.text('train_id IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_trains_status', 'trains', ['status', 'created_at', 'id'], unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_trains_operator_status', 'trains', ['operator_id', 'status', 'created_at', 'id'], unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_trains_operator_status', table_name='trains', postgresql_concurrently=True)
+        op.drop_index('ix_trains_status', table_name='trains', postgresql_concurrently=True)
+        op.drop_index('ix_parcels_train_id', table_name='parcels', postgresql_concurrently=True)
+        op.drop_index('ix_parcels_owner_active', table_name='parcels', postgresql_concurrently=True)
+        op.drop_index('ix_parcels_unassigned', table_name='parcels', postgresql_concurrently=True)
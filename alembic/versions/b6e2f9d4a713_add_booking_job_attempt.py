@@ -0,0 +1,26 @@
+"""Add booking job attempt
+
+Revision ID: b6e2f9d4a713
+Revises: 7d3a9e2b5c48
+Create Date: 2026-10-16 22:41:07.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e2f9d4a713'
+down_revision: Union[str, None] = '7d3a9e2b5c48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('booking_jobs', sa.Column('attempt', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('booking_jobs', 'attempt')
@@ -0,0 +1,42 @@
+"""Add destination backlog summary
+
+Revision ID: c4b7d2e9a185
+Revises: a93e1f06c2d4
+Create Date: 2026-10-16 11:27:40.662391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4b7d2e9a185'
+down_revision: Union[str, None] = 'a93e1f06c2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('destination_backlog',
+    sa.Column('destination', sa.String(), nullable=False),
+    sa.Column('pending_count', sa.Integer(), nullable=False),
+    sa.Column('pending_weight', sa.Float(), nullable=False),
+    sa.Column('pending_volume', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('destination')
+    )
+    op.execute(
+        "INSERT INTO destination_backlog (destination, pending_count, pending_weight, pending_volume, updated_at) "
+        "SELECT destination, count(*), sum(weight), sum(volume), now() FROM parcels "
+        "WHERE train_id IS NULL AND is_active GROUP BY destination"
+    )
+    # Train cost becomes the maintained total that capacity-cost reports, so seed it from the current load.
+    op.execute(
+        "UPDATE trains SET cost = current_weight * weight_cost_factor + current_volume * volume_cost_factor"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('destination_backlog')
@@ -0,0 +1,34 @@
+"""Add sent departure index
+
+Revision ID: d8a4c1e7f290
+Revises: b6e2f9d4a713
+Create Date: 2026-10-16 23:05:12.640318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a4c1e7f290'
+down_revision: Union[str, None] = 'b6e2f9d4a713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_trains_sent_departures', 'trains', ['departure_time'], unique=False,
+            postgresql_include=['assigned_line'],
+            postgresql_where=sa.text("status = 'SENT'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_trains_sent_departures', table_name='trains', postgresql_concurrently=True)
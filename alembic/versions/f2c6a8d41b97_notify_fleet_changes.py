@@ -0,0 +1,35 @@
+"""Notify fleet changes
+
+Revision ID: f2c6a8d41b97
+Revises: e81f3a5c9d26
+Create Date: 2026-10-16 13:42:05.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6a8d41b97'
+down_revision: Union[str, None] = 'e81f3a5c9d26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One notification per statement, so a bulk booking or a fleet plan wakes the snapshot builder once.
+    op.execute(
+        "CREATE FUNCTION notify_fleet_changed() RETURNS trigger AS $$ "
+        "BEGIN PERFORM pg_notify('fleet_changed', ''); RETURN NULL; END; "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER trains_notify_fleet_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON trains "
+        "FOR EACH STATEMENT EXECUTE FUNCTION notify_fleet_changed()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER trains_notify_fleet_changed ON trains")
+    op.execute("DROP FUNCTION notify_fleet_changed()")
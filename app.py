@@ -1,5 +1,17 @@
 from typing import Dict
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from common.authentication import decode_jwt, token_cache
+from common.cache import train_cache
+from common.events import listener
+from common.fleet import fleet_snapshots
+from common.jobs import booking_workers
+from common.enums import UserRole
+from common.metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, counter, gauge, render, request_metrics
+from common.scheduler import departure_scheduler
+from common.subscriptions import status_hub
+from config.config import settings
+from database.db import pool_metrics, pool_stats
 from routes.user import user_router
 from routes.parcel import parcel_router
 from routes.train import train_router
@@ -7,13 +19,89 @@ from routes.train import train_router
 app = FastAPI(title="Jenfi Long Mail Service - API Documentation")
 
 
+@app.on_event("startup")
+async def start_booking_workers():
+    booking_workers.start()
+
+
+@app.on_event("startup")
+async def start_fleet_snapshots():
+    listener.start()
+    fleet_snapshots.start()
+
+
+@app.on_event("startup")
+async def start_status_hub():
+    status_hub.start()
+
+
+@app.on_event("startup")
+async def start_departure_scheduler():
+    departure_scheduler.start()
+
+
+@app.on_event("startup")
+async def start_train_cache():
+    train_cache.start()
+
+
+@app.on_event("shutdown")
+async def stop_booking_workers():
+    await booking_workers.stop()
+
+
+@app.on_event("shutdown")
+async def stop_fleet_snapshots():
+    status_hub.stop()
+    await fleet_snapshots.stop()
+    await listener.stop()
+
+
+@app.on_event("shutdown")
+async def stop_departure_scheduler():
+    await departure_scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def stop_train_cache():
+    train_cache.stop()
+
+
 @app.get("/ping", tags=["Health"])
 async def read_root() -> Dict:
     return {"message": "pong"}
 
 
+@app.get("/pool", tags=["Health"])
+async def read_pool_stats(user=Depends(decode_jwt)) -> Dict:
+    if user.get("user_role") != UserRole.POST_MASTER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized as a Post Master"
+        )
+    return pool_stats()
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def read_metrics() -> PlainTextResponse:
+    token_stats, train_stats = token_cache.stats(), train_cache.stats()
+    families = request_metrics.families() + pool_metrics() + [
+        counter("token_cache_hits_total", "Bearer tokens served from the verified token cache.",
+                [({}, token_stats["hits"])]),
+        counter("token_cache_misses_total", "Bearer tokens that had to be decoded.", [({}, token_stats["misses"])]),
+        gauge("token_cache_entries", "Tokens held in the verified token cache.", [({}, token_stats["size"])]),
+        counter("train_cache_hits_total", "Train views served from the cache.", [({}, train_stats["hits"])]),
+        counter("train_cache_misses_total", "Train views read from the database.", [({}, train_stats["misses"])]),
+        gauge("status_subscriptions", "Open status event streams in this worker.", [({}, len(status_hub))]),
+    ]
+    return PlainTextResponse(render(families), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 app.router.prefix = "/api/v1"  # noqa
 
+if settings.REQUEST_METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, repeat_threshold=settings.QUERY_REPEAT_THRESHOLD)
+
 app.include_router(user_router, prefix="/users", tags=["Users"])
 app.include_router(parcel_router, prefix="/parcels", tags=["Parcels"])
 app.include_router(train_router, prefix="/trains", tags=["Trains"])
@@ -0,0 +1,74 @@
+"""
+Measure how login bursts affect the latency of other endpoints served by the same worker.
+
+Usage:
+    python -m benchmarks.auth_load --login-concurrency 16 --duration 20
+
+The app is driven in-process through its ASGI interface against the database in DATABASE_URL, which must be
+migrated. Run once with the default PASSWORD_HASH_WORKERS and once with PASSWORD_HASH_WORKERS=0 (hashing
+inline on the event loop, the previous behaviour) to compare p99 latencies.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app import app
+from benchmarks.latency import summarize
+from config.config import settings
+
+USERNAME = "bench-post-master"
+PASSWORD = "bench-password"
+
+
+async def _login(client):
+    response = await client.post("/api/v1/users/login", params={"username": USERNAME, "password": PASSWORD})
+    return response
+
+
+async def hammer_logins(client, stop_at, statuses):
+    while time.perf_counter() < stop_at:
+        response = await _login(client)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def probe(client, path, headers, stop_at, samples, interval):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        await client.get(path, headers=headers)
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--login-concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post(
+            "/api/v1/users/signup", params={"username": USERNAME, "password": PASSWORD, "role": "Post Master"}
+        )
+        token = (await _login(client)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        stop_at = time.perf_counter() + args.duration
+        statuses, probes = {}, {"/ping": [], "/api/v1/trains/all": []}
+        await asyncio.gather(
+            *(hammer_logins(client, stop_at, statuses) for _ in range(args.login_concurrency)),
+            *(probe(client, path, headers, stop_at, samples, args.probe_interval) for path, samples in probes.items()),
+        )
+
+    print(f"PASSWORD_HASH_WORKERS={settings.PASSWORD_HASH_WORKERS} login concurrency={args.login_concurrency}")
+    print(f"  login responses by status: {statuses}")
+    for path, samples in probes.items():
+        summary = summarize(samples)
+        print(f"  {path:<22} n={summary['count']:<6} p50={summary['p50_ms']:.1f} ms  p99={summary['p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
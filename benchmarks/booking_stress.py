@@ -0,0 +1,120 @@
+"""
+Stress parcel claiming with many concurrent bookings against a local Postgres.
+
+Usage:
+    ENGINE_PROFILE=bench python -m benchmarks.booking_stress --bookings 16 --parcels 200000 --reset
+
+The database must be migrated to head and disposable: it is reseeded with `2 * bookings` available trains
+and an all-unassigned backlog. The first half of the trains is booked one at a time and the second half all
+at once, then every train's recorded load is checked against the parcels actually assigned to it. Keep
+`--bookings` within the engine profile's pool size.
+"""
+import argparse
+import asyncio
+import math
+import time
+
+from sqlalchemy import create_engine, func, select
+
+from benchmarks.seed import seed
+from common.helpers import any_of, assign_parcels_to_train
+from config.config import settings
+from database.db import SessionLocal, engine
+from models.parcel import Parcel
+from models.train import Train
+
+
+async def book(train_id: str):
+    async with SessionLocal() as db:
+        train = await db.execute(select(Train).where(Train.id == train_id).with_for_update())  # noqa
+        await assign_parcels_to_train(db, train.scalars().one())
+
+
+async def assigned_count(train_ids):
+    async with SessionLocal() as db:
+        count = await db.execute(select(func.count()).where(any_of(Parcel.train_id, train_ids)))  # noqa
+        return count.scalar()
+
+
+async def verify(train_ids):
+    async with SessionLocal() as db:
+        loads = await db.execute(  # noqa
+            select(
+                Train.id,
+                Train.current_weight,
+                Train.current_volume,
+                Train.max_weight,
+                Train.max_volume,
+                func.coalesce(func.sum(Parcel.weight), 0),
+                func.coalesce(func.sum(Parcel.volume), 0),
+            )
+            .outerjoin(Parcel, Parcel.train_id == Train.id)
+            .where(any_of(Train.id, train_ids))
+            .group_by(Train.id)
+        )
+        problems = []
+        for train_id, weight, volume, max_weight, max_volume, parcel_weight, parcel_volume in loads.all():
+            matches = (
+                math.isclose(weight, parcel_weight, rel_tol=1e-6, abs_tol=1e-6) and
+                math.isclose(volume, parcel_volume, rel_tol=1e-6, abs_tol=1e-6)
+            )
+            if not matches:
+                problems.append(
+                    f"{train_id}: recorded {weight:.3f}/{volume:.3f}, assigned {parcel_weight:.3f}/{parcel_volume:.3f}"
+                )
+            if parcel_weight > max_weight + 1e-6 or parcel_volume > max_volume + 1e-6:
+                problems.append(f"{train_id}: over capacity with {parcel_weight:.3f}/{parcel_volume:.3f}")
+        return problems
+
+
+async def run(bookings: int):
+    sequential = [f"train-{n}" for n in range(1, bookings + 1)]
+    parallel = [f"train-{n}" for n in range(bookings + 1, 2 * bookings + 1)]
+
+    start = time.perf_counter()
+    for train_id in sequential:
+        await book(train_id)
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(book(train_id) for train_id in parallel))
+    parallel_time = time.perf_counter() - start
+
+    runs = (("sequential", sequential, sequential_time), ("parallel", parallel, parallel_time))
+    for label, train_ids, elapsed in runs:
+        parcels = await assigned_count(train_ids)
+        print(
+            f"{label:<10} {len(train_ids)} bookings in {elapsed:.2f} s: "
+            f"{len(train_ids) / elapsed:.1f} bookings/s, {parcels / elapsed:.0f} parcels/s"
+        )
+
+    problems = await verify(sequential + parallel)
+    await engine.dispose()
+    if problems:
+        raise SystemExit("Inconsistent bookings:\n" + "\n".join(problems))
+    print("every train's recorded load matches its assigned parcels and fits its capacity")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=16)
+    parser.add_argument("--parcels", type=int, default=200_000)
+    parser.add_argument("--reset", action="store_true", help="truncate users, trains and parcels first")
+    args = parser.parse_args()
+
+    seed(
+        create_engine(settings.ALEMBIC_DATABASE_URL),
+        reset=args.reset,
+        operators=args.bookings,
+        owners=1_000,
+        trains=2 * args.bookings,
+        parcels=args.parcels,
+        destinations=20,
+        backlog_share=1.0,
+        available_share=1.0,
+    )
+    asyncio.run(run(args.bookings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Per-endpoint latency and throughput benchmark for every router, driven in-process through the ASGI app.
+
+Usage:
+    ENGINE_PROFILE=bench python -m benchmarks.endpoints run --reset --parcels 200000 --output bench/HEAD.json
+    python -m benchmarks.endpoints diff bench/main.json bench/HEAD.json --threshold 10
+
+`run` seeds the database in DATABASE_URL (which must be migrated to head and disposable, see benchmarks.seed)
+unless `--no-seed` is given, then sends `--requests` requests to each endpoint in turn with `--concurrency`
+requests in flight and writes p50/p95/p99 latency, requests per second and response status counts per endpoint
+to a JSON file. Endpoints that consume state (bookings, withdrawals) are capped by what the seed provides, and
+`POST /trains/plan` only runs as a dry run. `diff` compares two such files and exits non-zero when any
+endpoint's p95 latency or throughput regressed by more than `--threshold` percent.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+import httpx
+from sqlalchemy import create_engine, select
+
+from app import app
+from benchmarks.latency import summarize
+from benchmarks.seed import seed
+from common.authentication import create_access_token
+from common.enums import TrainStatus, UserRole
+from config.config import settings
+from database.db import SessionLocal, engine
+from models.train import Train
+
+POST_MASTER = ("post-master", UserRole.POST_MASTER)
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: str
+    # Builds the n-th request: returns the acting (user_id, role), or None for anonymous, and httpx kwargs.
+    request: Callable[[int], tuple]
+    max_requests: Optional[int] = None
+
+
+def endpoints(fixture: dict) -> list:
+    """
+    The benchmarked requests, built from the deterministic ids of the seeded dataset.
+    """
+    parcels, owners, operators = fixture["parcels"], fixture["owners"], fixture["operators"]
+    available, run_tag = fixture["available_trains"], fixture["run_tag"]
+    # Bookings take trains from the head of the available list and withdrawals from the tail.
+    half = len(available) // 2
+
+    def owner_of(n):
+        return f"owner-{n % owners + 1}", UserRole.PARCEL_OWNER
+
+    def operator_of(n):
+        return f"operator-{n % operators + 1}", UserRole.TRAIN_OPERATOR
+
+    def parcel(n):
+        # Spread requests over the whole table instead of hammering the newest rows.
+        return (n * 7919) % parcels + 1
+
+    def train_number(train_id):
+        return int(train_id.rsplit("-", 1)[1])
+
+    def train(n):
+        return n % fixture["trains"] + 1
+
+    def owned_parcel_ids(n, count):
+        # parcel-N belongs to owner-(N % owners + 1), the same owner as owner_of(n).
+        numbers = (n % owners + k * owners for k in range(1, count + 1))
+        return [f"parcel-{number}" for number in numbers if number <= parcels]
+
+    bulk_body = "\n".join(
+        json.dumps({"weight": 1 + k % 20, "volume": 0.5 + k % 5, "destination": f"line-{k % 10}"})
+        for k in range(1_000)
+    )
+    offer = {
+        "weight_cost_factor": 1.0,
+        "volume_cost_factor": 1.0,
+        "max_weight": 5_000,
+        "max_volume": 2_000,
+        "available_lines": "line-0,line-1",
+        "status": TrainStatus.AVAILABLE.value,
+    }
+
+    return [
+        Endpoint("GET /ping", "GET", "/ping", lambda n: (None, {})),
+        Endpoint(
+            "POST /users/signup", "POST", "/api/v1/users/signup",
+            lambda n: (None, {"params": {
+                "username": f"bench-{run_tag}-{n}", "password": "bench-password", "role": UserRole.PARCEL_OWNER.value
+            }}),
+        ),
+        Endpoint(
+            "POST /users/login", "POST", "/api/v1/users/login",
+            lambda n: (None, {"params": {"username": fixture["login_username"], "password": "bench-password"}}),
+        ),
+        Endpoint("GET /users", "GET", "/api/v1/users", lambda n: (owner_of(n), {})),
+        Endpoint(
+            "POST /parcels", "POST", "/api/v1/parcels",
+            lambda n: (owner_of(n), {"json": {"weight": 5.0, "volume": 1.0, "destination": f"line-{n % 10}"}}),
+        ),
+        Endpoint(
+            "POST /parcels/bulk", "POST", "/api/v1/parcels/bulk",
+            lambda n: (owner_of(n), {"content": bulk_body, "headers": {"Content-Type": "application/x-ndjson"}}),
+            max_requests=50,
+        ),
+        Endpoint(
+            "GET /parcels/parcel_id/status", "GET", "/api/v1/parcels/parcel_id/status",
+            lambda n: (owner_of(parcel(n)), {"params": {"parcel_id": f"parcel-{parcel(n)}"}}),
+        ),
+        Endpoint(
+            "POST /parcels/status", "POST", "/api/v1/parcels/status",
+            lambda n: (owner_of(n), {"json": {"parcel_ids": owned_parcel_ids(n, 100)}}),
+        ),
+        Endpoint(
+            "POST /parcels/parcel_id/cost", "POST", "/api/v1/parcels/parcel_id/cost",
+            lambda n: (owner_of(parcel(n)), {"params": {"parcel_id": f"parcel-{parcel(n)}"}}),
+        ),
+        Endpoint(
+            "POST /parcels/quotes", "POST", "/api/v1/parcels/quotes",
+            lambda n: (owner_of(n), {"json": {"parcel_ids": owned_parcel_ids(n, 100)}}),
+        ),
+        Endpoint("GET /parcels", "GET", "/api/v1/parcels", lambda n: (owner_of(n), {"params": {"limit": 100}})),
+        Endpoint(
+            "DELETE /parcels/parcel_id", "DELETE", "/api/v1/parcels/parcel_id",
+            lambda n: (owner_of(parcels - n), {"params": {"parcel_id": f"parcel-{parcels - n}"}}),
+            max_requests=parcels // 2,
+        ),
+        Endpoint(
+            "GET /trains/available", "GET", "/api/v1/trains/available",
+            lambda n: (operator_of(n), {"params": {"limit": 100}}),
+        ),
+        Endpoint(
+            "GET /trains/train_id/capacity-cost", "GET", "/api/v1/trains/train_id/capacity-cost",
+            lambda n: (operator_of(train(n)), {"params": {"train_id": f"train-{train(n)}"}}),
+        ),
+        Endpoint("GET /trains/rail-lines", "GET", "/api/v1/trains/rail-lines", lambda n: (operator_of(n), {})),
+        Endpoint(
+            "GET /trains/train_id/status", "GET", "/api/v1/trains/train_id/status",
+            lambda n: (operator_of(train(n)), {"params": {"train_id": f"train-{train(n)}"}}),
+        ),
+        Endpoint(
+            "GET /trains/train_id", "GET", "/api/v1/trains/train_id",
+            lambda n: (operator_of(train(n)), {"params": {"train_id": f"train-{train(n)}"}}),
+        ),
+        Endpoint("POST /trains/offer", "POST", "/api/v1/trains/offer", lambda n: (operator_of(n), {"json": offer})),
+        Endpoint("GET /trains/all", "GET", "/api/v1/trains/all", lambda n: (POST_MASTER, {"params": {"limit": 100}})),
+        Endpoint("GET /trains/dashboard", "GET", "/api/v1/trains/dashboard", lambda n: (POST_MASTER, {})),
+        Endpoint(
+            "POST /trains/plan?dry_run", "POST", "/api/v1/trains/plan",
+            lambda n: (POST_MASTER, {"params": {"dry_run": "true"}}),
+            max_requests=5,
+        ),
+        Endpoint(
+            "POST /trains/train_id/book-fill-send", "POST", "/api/v1/trains/train_id/book-fill-send",
+            lambda n: (POST_MASTER, {"params": {"train_id": available[n]}}),
+            max_requests=half,
+        ),
+        Endpoint(
+            "DELETE /trains/train_id", "DELETE", "/api/v1/trains/train_id",
+            lambda n: (
+                operator_of(train_number(available[-1 - n])),
+                {"params": {"train_id": available[-1 - n]}},
+            ),
+            max_requests=len(available) - half,
+        ),
+    ]
+
+
+class Tokens:
+    def __init__(self):
+        self._tokens = {}
+
+    def headers(self, user: Optional[tuple]) -> dict:
+        if user is None:
+            return {}
+        if user not in self._tokens:
+            user_id, role = user
+            self._tokens[user] = create_access_token(
+                data={"user_id": user_id, "username": user_id, "user_role": role.value},
+                expires_delta=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+            )
+        return {"Authorization": f"Bearer {self._tokens[user]}"}
+
+
+async def measure(client, tokens: Tokens, endpoint: Endpoint, requests: int, concurrency: int) -> dict:
+    if endpoint.max_requests is not None:
+        requests = min(requests, endpoint.max_requests)
+    next_request = iter(range(requests))
+    samples, statuses = [], {}
+
+    async def worker():
+        for n in next_request:
+            user, kwargs = endpoint.request(n)
+            headers = {**kwargs.pop("headers", {}), **tokens.headers(user)}
+            start = time.perf_counter()
+            response = await client.request(endpoint.method, endpoint.path, headers=headers, **kwargs)
+            samples.append(time.perf_counter() - start)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**summarize(samples, elapsed), "statuses": statuses}
+
+
+async def available_trains() -> list:
+    async with SessionLocal() as db:
+        trains = await db.execute(  # noqa
+            select(Train.id).where(Train.status == TrainStatus.AVAILABLE, Train.is_active).order_by(Train.created_at)
+        )
+        return list(trains.scalars().all())
+
+
+async def run(args, fixture: dict) -> dict:
+    fixture["available_trains"] = await available_trains()
+    tokens = Tokens()
+    results = {}
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/api/v1/users/signup", params={
+            "username": fixture["login_username"], "password": "bench-password", "role": UserRole.PARCEL_OWNER.value
+        })
+        for endpoint in endpoints(fixture):
+            if args.only and not any(fragment in endpoint.name for fragment in args.only):
+                continue
+            results[endpoint.name] = summary = await measure(
+                client, tokens, endpoint, args.requests, args.concurrency
+            )
+            print(
+                f"{endpoint.name:<40} n={summary['count']:<6} p50={summary.get('p50_ms', 0):8.1f} ms  "
+                f"p95={summary.get('p95_ms', 0):8.1f} ms  p99={summary.get('p99_ms', 0):8.1f} ms  "
+                f"{summary.get('requests_per_second', 0):8.1f} req/s  {summary['statuses']}"
+            )
+    await engine.dispose()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_command(args):
+    fixture = {
+        "operators": args.operators,
+        "owners": args.owners,
+        "trains": args.trains,
+        "parcels": args.parcels,
+        "run_tag": format(int(time.time() * 1000), "x"),
+    }
+    fixture["login_username"] = f"bench-login-{fixture['run_tag']}"
+    if not args.no_seed:
+        seed(
+            create_engine(settings.ALEMBIC_DATABASE_URL),
+            reset=args.reset,
+            operators=args.operators,
+            owners=args.owners,
+            trains=args.trains,
+            parcels=args.parcels,
+            destinations=args.destinations,
+        )
+
+    results = asyncio.run(run(args, fixture))
+    report = {
+        "revision": git_revision(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "engine_profile": settings.ENGINE_PROFILE,
+        "settings": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "operators": args.operators,
+            "owners": args.owners,
+            "trains": args.trains,
+            "parcels": args.parcels,
+            "destinations": args.destinations,
+        },
+        "endpoints": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print(f"wrote {args.output}")
+
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def diff_command(args):
+    with open(args.before) as before_file, open(args.after) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    if before["settings"] != after["settings"]:
+        print(f"warning: runs used different settings\n  {before['settings']}\n  {after['settings']}")
+
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    regressions = []
+    for name in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old, new = before["endpoints"].get(name), after["endpoints"].get(name)
+        if not old or not new or not old["count"] or not new["count"]:
+            print(f"  {name:<40} only in {'after' if new else 'before'}")
+            continue
+        p95 = change(old["p95_ms"], new["p95_ms"])
+        p99 = change(old["p99_ms"], new["p99_ms"])
+        rps = change(old["requests_per_second"], new["requests_per_second"])
+        flag = ""
+        if p95 > args.threshold or -rps > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"  {name:<40} p95 {old['p95_ms']:8.1f} -> {new['p95_ms']:8.1f} ms ({p95:+6.1f}%)  "
+            f"p99 ({p99:+6.1f}%)  req/s {old['requests_per_second']:8.1f} -> {new['requests_per_second']:8.1f} "
+            f"({rps:+6.1f}%){flag}"
+        )
+        if old["statuses"] != new["statuses"]:
+            print(f"  {'':<40} statuses {old['statuses']} -> {new['statuses']}")
+    if regressions:
+        sys.exit(f"{len(regressions)} endpoint(s) regressed by more than {args.threshold}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed, benchmark every endpoint and write a JSON report")
+    run_parser.add_argument("--output", default="endpoints.json")
+    run_parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--only", nargs="*", help="only endpoints whose name contains one of these")
+    run_parser.add_argument("--operators", type=int, default=200)
+    run_parser.add_argument("--owners", type=int, default=5_000)
+    run_parser.add_argument("--trains", type=int, default=5_000)
+    run_parser.add_argument("--parcels", type=int, default=200_000)
+    run_parser.add_argument("--destinations", type=int, default=100)
+    run_parser.add_argument("--reset", action="store_true", help="truncate users, trains and parcels first")
+    run_parser.add_argument("--no-seed", action="store_true", help="reuse an already seeded database")
+    run_parser.set_defaults(handler=run_command)
+
+    diff_parser = commands.add_parser("diff", help="compare two reports")
+    diff_parser.add_argument("before")
+    diff_parser.add_argument("after")
+    diff_parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    diff_parser.set_defaults(handler=diff_command)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Seed a local Postgres with a realistic volume and capture EXPLAIN ANALYZE plans of the route queries with
+and without the hot-query indexes.
+
+Usage:
+    python -m benchmarks.explain_indexes --parcels 1000000 --trains 5000 --reset --output explain.json
+
+The database in ALEMBIC_DATABASE_URL must already be migrated to head. `--reset` truncates users, trains
+and parcels before seeding; never point it at a database whose data you want to keep.
+"""
+import argparse
+import json
+
+from sqlalchemy import and_, create_engine, select, text
+
+from benchmarks.seed import seed
+from common.enums import TrainStatus
+from common.helpers import cheapest_unassigned, lock_unassigned, unassigned_parcels
+from common.pagination import keyset
+from config.config import settings
+from models.parcel import Parcel
+from models.train import Train
+
+HOT_INDEXES = (
+    "ix_parcels_unassigned",
+    "ix_parcels_owner_active",
+    "ix_parcels_train_id",
+    "ix_trains_status",
+    "ix_trains_operator_status",
+)
+PAGE_SIZE = 100
+
+
+def route_queries():
+    """
+    The statements the routes run, built with the same helpers, for a representative train, owner and line.
+    """
+    train = Train(weight_cost_factor=1.0, volume_cost_factor=0.5, max_weight=1_000.0, max_volume=1_000.0)
+    shipping_cost = Train.weight_cost_factor * 10 + Train.volume_cost_factor * 2
+    return {
+        "assign_parcels_to_train": cheapest_unassigned(
+            train, train.max_weight, train.max_volume, settings.ASSIGNMENT_CLAIM_BATCH_SIZE
+        ),
+        "assign_parcels_to_train_next_batch": cheapest_unassigned(
+            train, train.max_weight, train.max_volume, settings.ASSIGNMENT_CLAIM_BATCH_SIZE, (5.0, "parcel-1")
+        ),
+        "lock_unassigned": lock_unassigned([f"parcel-{index}" for index in range(PAGE_SIZE)]),
+        "plan_parcels_for_fleet": unassigned_parcels(),
+        "get_parcels_for_owner": keyset(
+            select(Parcel).where(Parcel.owner_id == "owner-1", Parcel.is_active), Parcel, PAGE_SIZE + 1
+        ),
+        "parcels_on_train": select(Parcel).where(Parcel.train_id == "train-1"),
+        "get_all_trains": keyset(
+            select(Train).where(Train.status == TrainStatus.AVAILABLE), Train, PAGE_SIZE + 1
+        ),
+        "get_available_trains": keyset(
+            select(Train).where(and_(Train.operator_id == "operator-1", Train.status == TrainStatus.AVAILABLE)),
+            Train,
+            PAGE_SIZE + 1,
+        ),
+        "get_minimal_shipping_cost": select(Train.id, shipping_cost)
+        .where(Train.status == TrainStatus.AVAILABLE, Train.lines.contains(["line-1"]))
+        .order_by(shipping_cost)
+        .limit(1),
+    }
+
+
+def hot_indexes():
+    indexes = Parcel.__table__.indexes | Train.__table__.indexes
+    return [index for index in indexes if index.name in HOT_INDEXES]
+
+
+def explain_all(connection):
+    plans = {}
+    for name, query in route_queries().items():
+        compiled = query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+        result = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}")
+        plan = result.scalar()[0]
+        plans[name] = {
+            "execution_time_ms": plan["Execution Time"],
+            "node_types": sorted(_node_types(plan["Plan"])),
+            "plan": plan["Plan"],
+        }
+    return plans
+
+
+def _node_types(node):
+    found = {node["Node Type"]}
+    for child in node.get("Plans", []):
+        found |= _node_types(child)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operators", type=int, default=200)
+    parser.add_argument("--owners", type=int, default=5_000)
+    parser.add_argument("--trains", type=int, default=5_000)
+    parser.add_argument("--parcels", type=int, default=1_000_000)
+    parser.add_argument("--destinations", type=int, default=100)
+    parser.add_argument("--backlog-share", type=float, default=0.05)
+    parser.add_argument("--reset", action="store_true", help="truncate users, trains and parcels first")
+    parser.add_argument("--output", default="explain.json")
+    args = parser.parse_args()
+
+    engine = create_engine(settings.ALEMBIC_DATABASE_URL)
+    seed(
+        engine,
+        reset=args.reset,
+        operators=args.operators,
+        owners=args.owners,
+        trains=args.trains,
+        parcels=args.parcels,
+        destinations=args.destinations,
+        backlog_share=args.backlog_share,
+        available_share=0.2,
+    )
+
+    report = {}
+    with engine.begin() as connection:
+        for index in hot_indexes():
+            index.drop(connection, checkfirst=True)
+        connection.execute(text("ANALYZE users, trains, parcels"))
+        report["before"] = explain_all(connection)
+
+    with engine.begin() as connection:
+        for index in hot_indexes():
+            index.create(connection, checkfirst=True)
+        connection.execute(text("ANALYZE users, trains, parcels"))
+        report["after"] = explain_all(connection)
+
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    print(f"{'query':<36} {'before (ms)':>12} {'after (ms)':>11}  plan change")
+    for name in report["before"]:
+        before, after = report["before"][name], report["after"][name]
+        print(
+            f"{name:<36} {before['execution_time_ms']:>12.2f} {after['execution_time_ms']:>11.2f}  "
+            f"{', '.join(before['node_types'])} -> {', '.join(after['node_types'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
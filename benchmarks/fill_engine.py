@@ -0,0 +1,95 @@
+"""
+Compare the vectorized fill engine against the original per-parcel assignment loop.
+
+Usage:
+    python -m benchmarks.fill_engine --sizes 10000 100000 1000000
+
+The legacy loop is reproduced without the database, so its timings exclude the one `COMMIT` per accepted
+parcel that the original helper issued; the reported commit count shows how many round trips it would add.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_backlog, make_train
+from common.packing import greedy_fill, shipping_costs
+
+
+class _Parcel:
+    __slots__ = ("weight", "volume")
+
+    def __init__(self, weight, volume):
+        self.weight = weight
+        self.volume = volume
+
+    def calculate_shipping_cost(self, train):
+        return self.weight * train["weight_cost_factor"] + self.volume * train["volume_cost_factor"]
+
+
+def legacy_fill(parcels, train):
+    parcels_with_costs = [(parcel, parcel.calculate_shipping_cost(train)) for parcel in parcels]
+    sorted_parcels = sorted(parcels_with_costs, key=lambda x: x[1])
+
+    current_weight, current_volume, accepted = train["current_weight"], train["current_volume"], 0
+    for parcel, _ in sorted_parcels:
+        if (
+                current_weight + parcel.weight <= train["max_weight"] and
+                current_volume + parcel.volume <= train["max_volume"]
+        ):
+            current_weight += parcel.weight
+            current_volume += parcel.volume
+            accepted += 1
+    return accepted
+
+
+def vectorized_fill(weights, volumes, train):
+    costs = shipping_costs(weights, volumes, train["weight_cost_factor"], train["volume_cost_factor"])
+    return greedy_fill(
+        weights,
+        volumes,
+        costs,
+        train["max_weight"] - train["current_weight"],
+        train["max_volume"] - train["current_volume"],
+    ).size
+
+
+def _best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--fill-share", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'parcels':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9} {'accepted':>9} "
+        f"{'commits saved':>14}"
+    )
+    for size in args.sizes:
+        weights, volumes = make_backlog(size)
+        train = make_train(weights, volumes, args.fill_share)
+        parcels = [_Parcel(weight, volume) for weight, volume in zip(weights.tolist(), volumes.tolist())]
+
+        legacy_time, legacy_accepted = _best_of(lambda: legacy_fill(parcels, train), args.repeat)
+        fast_time, fast_accepted = _best_of(lambda: vectorized_fill(weights, volumes, train), args.repeat)
+        if legacy_accepted != fast_accepted:
+            raise SystemExit(f"Mismatch at {size} parcels: legacy={legacy_accepted} vectorized={fast_accepted}")
+
+        print(
+            f"{size:>10} {legacy_time:>12.4f} {fast_time:>15.4f} {legacy_time / fast_time:>8.1f}x "
+            f"{fast_accepted:>9} {legacy_accepted - 1:>14}"
+        )
+
+
+if __name__ == "__main__":
+    np.seterr(all="raise")
+    main()
@@ -0,0 +1,20 @@
+import numpy as np
+
+
+def summarize(samples: list, elapsed: float = None) -> dict:
+    """
+    Summarize request latencies (in seconds) as milliseconds percentiles and, given the wall time, throughput.
+    """
+    if not samples:
+        return {"count": 0}
+    latencies = np.asarray(samples) * 1000
+    summary = {
+        "count": len(samples),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+    if elapsed:
+        summary["requests_per_second"] = len(samples) / elapsed
+    return summary
@@ -0,0 +1,131 @@
+"""
+Cost per parcel of checking shipping status one parcel per request (`GET /parcels/parcel_id/status`) against
+the batch route (`POST /parcels/status`), driven in-process through the ASGI app.
+
+Usage:
+    ENGINE_PROFILE=bench python -m benchmarks.parcel_status --reset --batch-sizes 10 100 1000 5000
+    python -m benchmarks.parcel_status --no-seed --parcels 200000 --owners 40
+
+The database in DATABASE_URL is seeded as for benchmarks.endpoints (it must be migrated to head and
+disposable) unless `--no-seed` is given; few owners are used by default so that every owner has thousands of
+parcels. Each mode checks `--parcels-checked` parcels of the same owners with `--concurrency` requests in
+flight and reports latency per request, parcels checked per second, and request time, SQL statements (from
+the Server-Timing header) and response bytes per parcel.
+"""
+import argparse
+import asyncio
+import re
+import time
+
+import httpx
+from sqlalchemy import create_engine
+
+from app import app
+from benchmarks.endpoints import Tokens
+from benchmarks.latency import summarize
+from benchmarks.seed import seed
+from common.enums import UserRole
+from config.config import settings
+from database.db import engine
+
+_QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+
+def owned_parcel_ids(owner: int, owners: int, parcels: int, start: int, count: int) -> list:
+    # parcel-N belongs to owner-(N % owners + 1) and numbering starts at 1; windows wrap around the owner's parcels.
+    first = owner - 1 or owners
+    per_owner = (parcels - first) // owners + 1
+    return [f"parcel-{first + (start + k) % per_owner * owners}" for k in range(count)]
+
+
+async def check(client, tokens, args, batch_size: int) -> dict:
+    requests = max(1, args.parcels_checked // batch_size)
+    next_request = iter(range(requests))
+    samples, queries, sizes, checked = [], [], [], []
+
+    async def worker():
+        for n in next_request:
+            owner = n % args.owners + 1
+            parcel_ids = owned_parcel_ids(owner, args.owners, args.parcels, n // args.owners * batch_size, batch_size)
+            headers = tokens.headers((f"owner-{owner}", UserRole.PARCEL_OWNER))
+            start = time.perf_counter()
+            if batch_size == 1:
+                response = await client.get(
+                    "/api/v1/parcels/parcel_id/status", params={"parcel_id": parcel_ids[0]}, headers=headers
+                )
+            else:
+                response = await client.post(
+                    "/api/v1/parcels/status", json={"parcel_ids": parcel_ids}, headers=headers
+                )
+            samples.append(time.perf_counter() - start)
+            if response.status_code >= 500:
+                raise SystemExit(f"{response.request.url} failed with {response.status_code}")
+            match = _QUERY_COUNT.search(response.headers.get("server-timing", ""))
+            queries.append(int(match.group(1)) if match else 0)
+            sizes.append(len(response.content))
+            checked.append(len(parcel_ids))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    parcels = sum(checked)
+    return {
+        **summarize(samples, elapsed),
+        "parcels": parcels,
+        "parcels_per_second": parcels / elapsed,
+        "ms_per_parcel": sum(samples) * 1000 / parcels,
+        "queries_per_parcel": sum(queries) / parcels,
+        "bytes_per_parcel": sum(sizes) / parcels,
+    }
+
+
+async def run(args):
+    tokens = Tokens()
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(
+            f"{'route':<28} {'ids/req':>8} {'requests':>9} {'p50 ms':>9} {'p95 ms':>9} {'parcels/s':>10} "
+            f"{'ms/parcel':>10} {'SQL/parcel':>11} {'bytes/parcel':>13}"
+        )
+        for batch_size in [1, *args.batch_sizes]:
+            result = await check(client, tokens, args, batch_size)
+            route = "GET /parcels/parcel_id/status" if batch_size == 1 else "POST /parcels/status"
+            print(
+                f"{route:<28} {batch_size:>8} {result['count']:>9} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                f"{result['parcels_per_second']:>10.0f} {result['ms_per_parcel']:>10.4f} "
+                f"{result['queries_per_parcel']:>11.4f} {result['bytes_per_parcel']:>13.1f}"
+            )
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1_000, 5_000])
+    parser.add_argument("--parcels-checked", type=int, default=20_000, help="parcels checked per mode")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--owners", type=int, default=40)
+    parser.add_argument("--trains", type=int, default=5_000)
+    parser.add_argument("--parcels", type=int, default=200_000)
+    parser.add_argument("--reset", action="store_true", help="truncate users, trains and parcels first")
+    parser.add_argument("--no-seed", action="store_true", help="reuse an already seeded database")
+    args = parser.parse_args()
+
+    if max(args.batch_sizes) > settings.MAX_STATUS_BATCH_SIZE:
+        parser.error(f"batch sizes are capped at MAX_STATUS_BATCH_SIZE={settings.MAX_STATUS_BATCH_SIZE}")
+    if max(args.batch_sizes) > args.parcels // args.owners:
+        # A larger batch would wrap around the owner's parcels and repeat ids, which the route collapses.
+        parser.error(f"batch sizes are capped at --parcels / --owners = {args.parcels // args.owners}")
+    if not args.no_seed:
+        seed(
+            create_engine(settings.ALEMBIC_DATABASE_URL),
+            reset=args.reset,
+            owners=args.owners,
+            trains=args.trains,
+            parcels=args.parcels,
+        )
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
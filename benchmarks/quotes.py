@@ -0,0 +1,74 @@
+"""
+Time the batch quote kernel against quoting parcels one by one the way `get_minimal_shipping_cost` did.
+
+Usage:
+    python -m benchmarks.quotes --parcels 10000 --trains 1000 --destinations 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_backlog
+from common.packing import cheapest_trains
+
+
+def legacy_quotes(weights, volumes, destinations, trains):
+    quotes = []
+    for weight, volume, destination in zip(weights, volumes, destinations):
+        min_cost, by_train = float("inf"), None
+        for train_id, weight_cost_factor, volume_cost_factor, available_lines in trains:
+            cost = weight * weight_cost_factor + volume * volume_cost_factor
+            if cost < min_cost and destination in available_lines.split(","):
+                min_cost, by_train = cost, train_id
+        quotes.append(by_train)
+    return quotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parcels", type=int, default=10_000)
+    parser.add_argument("--trains", type=int, default=1_000)
+    parser.add_argument("--destinations", type=int, default=200)
+    parser.add_argument("--lines-per-train", type=int, default=5)
+    parser.add_argument("--legacy-sample", type=int, default=1_000, help="parcels quoted by the legacy loop")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    weights, volumes = make_backlog(args.parcels)
+    destination_codes = rng.integers(0, args.destinations, args.parcels)
+    weight_cost_factors = rng.uniform(0.5, 2.0, args.trains)
+    volume_cost_factors = rng.uniform(0.5, 2.0, args.trains)
+    line_matrix = np.zeros((args.destinations, args.trains), dtype=bool)
+    for train_index in range(args.trains):
+        line_matrix[rng.choice(args.destinations, args.lines_per_train, replace=False), train_index] = True
+
+    start = time.perf_counter()
+    train_indices, _ = cheapest_trains(
+        weights, volumes, destination_codes, weight_cost_factors, volume_cost_factors, line_matrix
+    )
+    batch_time = time.perf_counter() - start
+
+    trains = [
+        (index, weight_cost_factors[index], volume_cost_factors[index],
+         ",".join(str(code) for code in np.flatnonzero(line_matrix[:, index])))
+        for index in range(args.trains)
+    ]
+    sample = min(args.legacy_sample, args.parcels)
+    start = time.perf_counter()
+    legacy = legacy_quotes(
+        weights[:sample].tolist(), volumes[:sample].tolist(), [str(code) for code in destination_codes[:sample]], trains
+    )
+    legacy_time = (time.perf_counter() - start) * args.parcels / sample
+
+    if [index if index >= 0 else None for index in train_indices[:sample].tolist()] != legacy:
+        raise SystemExit("Batch and legacy quotes disagree")
+
+    print(f"{args.parcels} parcels x {args.trains} trains")
+    print(f"  batch kernel : {batch_time:.4f} s")
+    print(f"  legacy loop  : {legacy_time:.4f} s (extrapolated from {sample} parcels)")
+    print(f"  speedup      : {legacy_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
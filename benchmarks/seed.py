@@ -0,0 +1,79 @@
+from sqlalchemy import text
+
+SEED_SQL = """
+INSERT INTO users (id, username, password, role, created_at, updated_at, is_active)
+SELECT 'operator-' || n, 'operator-' || n, 'x', 'TRAIN_OPERATOR', now(), now(), true
+FROM generate_series(1, :operators) AS n;
+
+INSERT INTO users (id, username, password, role, created_at, updated_at, is_active)
+SELECT 'owner-' || n, 'owner-' || n, 'x', 'PARCEL_OWNER', now(), now(), true
+FROM generate_series(1, :owners) AS n;
+
+INSERT INTO users (id, username, password, role, created_at, updated_at, is_active)
+VALUES ('post-master', 'post-master', 'x', 'POST_MASTER', now(), now(), true);
+
+INSERT INTO trains (
+    id, operator_id, weight_cost_factor, volume_cost_factor, cost, max_weight, max_volume,
+    current_weight, current_volume, available_lines, lines, status, created_at, updated_at, is_active
+)
+SELECT 'train-' || n, 'operator-' || (n % :operators + 1), 0.5 + random() * 1.5, 0.5 + random() * 1.5, 0,
+       :max_weight, :max_volume, 0, 0, lines, string_to_array(lines, ','),
+       (CASE WHEN random() < :available_share THEN 'AVAILABLE' ELSE 'SENT' END)::trainstatus,
+       now() - n * interval '1 minute', now(), true
+FROM (
+    SELECT n, 'line-' || (n % :destinations) || ',line-' || ((n * 7) % :destinations) AS lines
+    FROM generate_series(1, :trains) AS n
+) AS seeded;
+
+INSERT INTO parcels (
+    id, owner_id, weight, volume, destination, has_shipped, train_id, created_at, updated_at, is_active
+)
+SELECT 'parcel-' || n, 'owner-' || (n % :owners + 1), 1 + random() * 20, 0.5 + random() * 5,
+       'line-' || (n % :destinations), assigned, CASE WHEN assigned THEN 'train-' || (n % :trains + 1) END,
+       now() - n * interval '1 second', now(), random() > 0.02
+FROM (SELECT n, random() > :backlog_share AS assigned FROM generate_series(1, :parcels) AS n) AS seeded;
+
+INSERT INTO destination_backlog (destination, pending_count, pending_weight, pending_volume, updated_at)
+SELECT destination, count(*), sum(weight), sum(volume), now() FROM parcels
+WHERE train_id IS NULL AND is_active GROUP BY destination
+"""
+
+
+def seed(
+        engine,
+        reset: bool = False,
+        operators: int = 200,
+        owners: int = 5_000,
+        trains: int = 5_000,
+        parcels: int = 1_000_000,
+        destinations: int = 100,
+        backlog_share: float = 0.05,
+        available_share: float = 0.2,
+        max_weight: float = 5_000,
+        max_volume: float = 2_000,
+):
+    """
+    Seed users, trains, parcels and the destination backlog summary with deterministic ids (`operator-N`,
+    `owner-N`, `post-master`, `train-N`, `parcel-N`) through a synchronous engine.
+
+    A `backlog_share` of the parcels is left unassigned and an `available_share` of the trains is AVAILABLE.
+    With `reset` the three tables are truncated first; otherwise seeding refuses to touch a non-empty database.
+    """
+    with engine.begin() as connection:
+        if reset:
+            connection.execute(text("TRUNCATE parcels, trains, users, destination_backlog CASCADE"))
+        elif connection.execute(text("SELECT EXISTS (SELECT 1 FROM users)")).scalar():
+            raise SystemExit("users is not empty; rerun with --reset on a disposable database")
+        for statement in SEED_SQL.split(";\n"):
+            connection.execute(text(statement), {
+                "operators": operators,
+                "owners": owners,
+                "trains": trains,
+                "parcels": parcels,
+                "destinations": destinations,
+                "backlog_share": backlog_share,
+                "available_share": available_share,
+                "max_weight": max_weight,
+                "max_volume": max_volume,
+            })
+        connection.execute(text("ANALYZE users, trains, parcels, destination_backlog"))
@@ -0,0 +1,104 @@
+"""
+Measure the CPU spent serializing list responses on the default path against the `fast=true` path.
+
+Usage:
+    python -m benchmarks.serialization --rows 10000 100000
+
+The default path is reproduced with FastAPI's own response handling for the route: ORM objects are validated
+against its `response_model` and the result is encoded by `JSONResponse`. The fast path builds dicts straight
+from the column tuples and encodes them with `ORJSONResponse`, as `paginate_rows` and `json_rows` do. Both
+start from rows already in memory, so query time and, on the default path, ORM loading are excluded. CPU time
+is the best of `--repeat` runs, scaled to 10k rows, and both bodies are checked to decode to the same JSON.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+
+from app import app
+from common.enums import TrainStatus
+from models.parcel import Parcel
+from models.train import Train
+from schemas.parcel import ParcelResponse
+from schemas.train import TrainResponse
+
+
+def make_rows(schema, size: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    values = {
+        "id": lambda n: f"row-{n}",
+        "operator_id": lambda n: f"operator-{n % 200}",
+        "owner_id": lambda n: f"owner-{n % 5_000}",
+        "available_lines": lambda n: f"line-{n % 100},line-{(n * 7) % 100}",
+        "destination": lambda n: f"line-{n % 100}",
+        "origin": lambda n: None,
+        "status": lambda n: TrainStatus.AVAILABLE,
+        "created_at": lambda n: start + timedelta(seconds=n, microseconds=n % 1_000_000),
+        "updated_at": lambda n: start + timedelta(seconds=2 * n),
+        "is_active": lambda n: True,
+    }
+    floats = rng.uniform(0.5, 5_000, size=(size, len(schema.model_fields))).tolist()
+    return [
+        tuple(
+            values[name](n) if name in values else floats[n][column]
+            for column, name in enumerate(schema.model_fields)
+        )
+        for n in range(size)
+    ]
+
+
+def default_body(field, objects) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=objects))
+    return JSONResponse(content).body
+
+
+def fast_body(schema, rows) -> bytes:
+    names = list(schema.model_fields)
+    return ORJSONResponse([dict(zip(names, row)) for row in rows]).body
+
+
+def _cpu_best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        result = func()
+        timings.append(time.process_time() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    routes = {route.path: route for route in app.routes}
+    cases = (
+        ("GET /trains/all", routes["/api/v1/trains/all"].response_field, Train, TrainResponse),
+        ("GET /parcels", routes["/api/v1/parcels"].response_field, Parcel, ParcelResponse),
+    )
+    print(f"{'route':<16} {'rows':>8} {'default ms/10k':>15} {'fast ms/10k':>12} {'saved ms/10k':>13} {'speedup':>8}")
+    for label, field, model, schema in cases:
+        for size in args.rows:
+            rows = make_rows(schema, size)
+            objects = [model(**dict(zip(schema.model_fields, row))) for row in rows]
+            default_time, default = _cpu_best_of(lambda: default_body(field, objects), args.repeat)
+            fast_time, fast = _cpu_best_of(lambda: fast_body(schema, rows), args.repeat)
+            if json.loads(default) != json.loads(fast):
+                raise SystemExit(f"{label}: the fast path produced a different body")
+
+            scale = 10_000 / size * 1000
+            print(
+                f"{label:<16} {size:>8} {default_time * scale:>15.1f} {fast_time * scale:>12.1f} "
+                f"{(default_time - fast_time) * scale:>13.1f} {default_time / fast_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
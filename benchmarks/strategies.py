@@ -0,0 +1,195 @@
+"""
+Compare parcel assignment strategies offline, on the same synthetic backlogs and fleets, without HTTP or a
+database.
+
+Usage:
+    python -m benchmarks.strategies --sizes 1000 10000 100000 1000000 --trains 10
+    python -m benchmarks.strategies --strategies baseline greedy mypackage.fill:knapsack --output fill.json
+
+A strategy fills one train: it is called as `strategy(weights, volumes, costs, free_weight, free_volume)`
+with the train's candidate parcels and returns the indices of the accepted ones, like
+`common.packing.greedy_fill`. Besides the built-in names, any `module:function` path can be given. Trains are
+filled one after another in fleet order, each from the parcels still unassigned whose destination is on one
+of its lines (`--ignore-lines` offers every parcel to every train, as `assign_parcels_to_train` does).
+
+For every size and strategy the harness reports the best wall time of the fleet pass over `--repeat` runs,
+peak traced memory of a separate run under tracemalloc, parcels shipped, the share of the fleet's weight and
+volume capacity used and the total shipping cost. `baseline` is the original sort-then-scan loop in
+pure Python.
+"""
+import argparse
+import importlib
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import make_backlog, make_destinations, make_fleet
+from common.packing import greedy_fill, shipping_costs
+
+
+def sort_then_scan(weights, volumes, costs, free_weight, free_volume):
+    weights, volumes, costs = weights.tolist(), volumes.tolist(), costs.tolist()
+    accepted = []
+    for index in sorted(range(len(costs)), key=costs.__getitem__):
+        if weights[index] <= free_weight and volumes[index] <= free_volume:
+            free_weight -= weights[index]
+            free_volume -= volumes[index]
+            accepted.append(index)
+    return np.asarray(accepted, dtype=np.intp)
+
+
+def _capacity_share(weights, volumes, free_weight, free_volume):
+    return weights / max(free_weight, 1e-12) + volumes / max(free_volume, 1e-12)
+
+
+def largest_first(weights, volumes, costs, free_weight, free_volume):
+    # Bulky parcels first, then smaller ones into the gaps: aims at the fill ratio rather than the cost.
+    ranking = -_capacity_share(weights, volumes, free_weight, free_volume)
+    return greedy_fill(weights, volumes, ranking, free_weight, free_volume)
+
+
+def cost_density(weights, volumes, costs, free_weight, free_volume):
+    # Cheapest per share of capacity used first.
+    ranking = costs / np.maximum(_capacity_share(weights, volumes, free_weight, free_volume), 1e-12)
+    return greedy_fill(weights, volumes, ranking, free_weight, free_volume)
+
+
+STRATEGIES = {
+    "baseline": sort_then_scan,
+    "greedy": greedy_fill,
+    "largest-first": largest_first,
+    "cost-density": cost_density,
+}
+
+
+def load_strategy(name: str):
+    if name in STRATEGIES:
+        return STRATEGIES[name]
+    module, _, function = name.partition(":")
+    if not function:
+        raise SystemExit(f"Unknown strategy {name!r}; use one of {sorted(STRATEGIES)} or module:function")
+    return getattr(importlib.import_module(module), function)
+
+
+def fill_fleet(strategy, weights, volumes, destination_codes, fleet, respect_lines=True):
+    """
+    Fill every train of the fleet in order with `strategy`.
+
+    Returns:
+    - dict: Parcels shipped, shipped weight, volume and cost, and the fleet's weight and volume capacity.
+    """
+    assigned = np.zeros(weights.size, dtype=bool)
+    totals = dict.fromkeys(("parcels", "weight", "volume", "cost", "capacity_weight", "capacity_volume"), 0.0)
+
+    for train in fleet:
+        free_weight = train["max_weight"] - train["current_weight"]
+        free_volume = train["max_volume"] - train["current_volume"]
+        eligible = ~assigned
+        if respect_lines:
+            eligible &= np.isin(destination_codes, train["line_codes"])
+        candidates = np.flatnonzero(eligible)
+        costs = shipping_costs(
+            weights[candidates], volumes[candidates], train["weight_cost_factor"], train["volume_cost_factor"]
+        )
+        chosen = np.asarray(
+            strategy(weights[candidates], volumes[candidates], costs, free_weight, free_volume), dtype=np.intp
+        )
+        accepted = candidates[chosen]
+        if assigned[accepted].any() or np.unique(accepted).size != accepted.size:
+            raise SystemExit("strategy accepted a parcel twice")
+        if weights[accepted].sum() > free_weight + 1e-6 or volumes[accepted].sum() > free_volume + 1e-6:
+            raise SystemExit("strategy overfilled a train")
+
+        assigned[accepted] = True
+        totals["parcels"] += accepted.size
+        totals["weight"] += float(weights[accepted].sum())
+        totals["volume"] += float(volumes[accepted].sum())
+        totals["cost"] += float(costs[chosen].sum())
+        totals["capacity_weight"] += free_weight
+        totals["capacity_volume"] += free_volume
+    return totals
+
+
+def measure(strategy, backlog, fleet, respect_lines, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        totals = fill_fleet(strategy, *backlog, fleet, respect_lines)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fill_fleet(strategy, *backlog, fleet, respect_lines)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": min(timings),
+        "peak_mib": peak / 2 ** 20,
+        "parcels_shipped": int(totals["parcels"]),
+        "weight_fill": totals["weight"] / totals["capacity_weight"],
+        "volume_fill": totals["volume"] / totals["capacity_volume"],
+        "total_cost": totals["cost"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES))
+    parser.add_argument("--trains", type=int, default=10)
+    parser.add_argument("--destinations", type=int, default=20)
+    parser.add_argument("--destination-skew", type=float, default=1.0, help="0 spreads parcels uniformly")
+    parser.add_argument("--lines-per-train", type=int, default=3)
+    parser.add_argument("--fill-share", type=float, default=0.5, help="fleet capacity as a share of the backlog")
+    parser.add_argument("--capacity-spread", type=float, default=0.5)
+    parser.add_argument("--cost-factors", type=float, nargs=2, default=[0.5, 2.0], metavar=("LOW", "HIGH"))
+    parser.add_argument("--weight-sigma", type=float, default=0.75)
+    parser.add_argument("--volume-sigma", type=float, default=0.9)
+    parser.add_argument("--ignore-lines", action="store_true", help="offer every parcel to every train")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    strategies = {name: load_strategy(name) for name in args.strategies}
+    results = []
+    print(
+        f"{'parcels':>9} {'strategy':<16} {'time (s)':>9} {'peak MiB':>9} {'shipped':>9} "
+        f"{'weight fill':>12} {'volume fill':>12} {'total cost':>14}"
+    )
+    for size in args.sizes:
+        weights, volumes = make_backlog(
+            size, seed=args.seed, weight_sigma=args.weight_sigma, volume_sigma=args.volume_sigma
+        )
+        destination_codes = make_destinations(size, args.destinations, args.destination_skew, seed=args.seed)
+        fleet = make_fleet(
+            args.trains,
+            weights,
+            volumes,
+            args.destinations,
+            fill_share=args.fill_share,
+            capacity_spread=args.capacity_spread,
+            cost_factor_range=tuple(args.cost_factors),
+            lines_per_train=args.lines_per_train,
+            seed=args.seed,
+        )
+        for name, strategy in strategies.items():
+            result = measure(
+                strategy, (weights, volumes, destination_codes), fleet, not args.ignore_lines, args.repeat
+            )
+            results.append({"parcels": size, "strategy": name, **result})
+            print(
+                f"{size:>9} {name:<16} {result['seconds']:>9.4f} {result['peak_mib']:>9.1f} "
+                f"{result['parcels_shipped']:>9} {result['weight_fill']:>11.1%} {result['volume_fill']:>11.1%} "
+                f"{result['total_cost']:>14.1f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"settings": vars(args), "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+def make_backlog(
+        size: int,
+        seed: int = 0,
+        weight_mean: float = 1.5,
+        weight_sigma: float = 0.75,
+        volume_mean: float = 0.5,
+        volume_sigma: float = 0.9,
+):
+    """
+    Generate a synthetic backlog of parcels with log-normal weights and volumes.
+
+    Returns:
+    - tuple: `(weights, volumes)` as float64 arrays of length `size`.
+    """
+    rng = np.random.default_rng(seed)
+    weights = rng.lognormal(mean=weight_mean, sigma=weight_sigma, size=size)
+    volumes = rng.lognormal(mean=volume_mean, sigma=volume_sigma, size=size)
+    return weights, volumes
+
+
+def make_destinations(size: int, destinations: int, skew: float = 1.0, seed: int = 0):
+    """
+    Generate parcel destination codes `0..destinations-1` with Zipf-like popularity: destination `k` is
+    drawn with probability proportional to `1 / (k + 1) ** skew`, so `skew=0` is uniform.
+
+    Returns:
+    - np.ndarray: Integer destination code of every parcel.
+    """
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, destinations + 1) ** skew
+    return rng.choice(destinations, size=size, p=popularity / popularity.sum())
+
+
+def make_train(weights: np.ndarray, volumes: np.ndarray, fill_share: float = 0.1, seed: int = 0):
+    """
+    Generate a train whose capacity holds roughly `fill_share` of the given backlog.
+
+    Returns:
+    - dict: Train attributes mirroring the `Train` model columns used by assignment.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        "weight_cost_factor": float(rng.uniform(0.5, 2.0)),
+        "volume_cost_factor": float(rng.uniform(0.5, 2.0)),
+        "max_weight": float(weights.sum() * fill_share),
+        "max_volume": float(volumes.sum() * fill_share),
+        "current_weight": 0.0,
+        "current_volume": 0.0,
+    }
+
+
+def make_fleet(
+        count: int,
+        weights: np.ndarray,
+        volumes: np.ndarray,
+        destinations: int,
+        fill_share: float = 0.5,
+        capacity_spread: float = 0.5,
+        cost_factor_range: tuple = (0.5, 2.0),
+        lines_per_train: int = 3,
+        seed: int = 0,
+):
+    """
+    Generate a fleet whose combined capacity holds roughly `fill_share` of the given backlog.
+
+    Each train's capacity varies by up to `capacity_spread` around the fleet average, its cost factors are
+    uniform in `cost_factor_range` and it serves `lines_per_train` distinct destinations.
+
+    Returns:
+    - list: One dict per train with the `Train` columns used by assignment plus `line_codes`.
+    """
+    rng = np.random.default_rng(seed)
+    low, high = cost_factor_range
+    scale = rng.uniform(1 - capacity_spread, 1 + capacity_spread, size=count) * fill_share / count
+    fleet = []
+    for n in range(count):
+        fleet.append({
+            "weight_cost_factor": float(rng.uniform(low, high)),
+            "volume_cost_factor": float(rng.uniform(low, high)),
+            "max_weight": float(weights.sum() * scale[n]),
+            "max_volume": float(volumes.sum() * scale[n]),
+            "current_weight": 0.0,
+            "current_volume": 0.0,
+            "line_codes": rng.choice(destinations, size=min(lines_per_train, destinations), replace=False).tolist(),
+        })
+    return fleet
@@ -0,0 +1,48 @@
+"""
+Microbenchmark of the per-request cost of `decode_jwt` with and without the verified-token cache.
+
+Usage:
+    python -m benchmarks.token_cache --tokens 100 --calls 100000
+"""
+import argparse
+import time
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from common import authentication
+from common.authentication import VerifiedTokenCache, create_access_token, decode_jwt
+
+
+def run(credentials, calls):
+    start = time.perf_counter()
+    for index in range(calls):
+        decode_jwt(credentials[index % len(credentials)])
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=100, help="distinct clients reusing their token")
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    credentials = [
+        HTTPAuthorizationCredentials(
+            scheme="Bearer",
+            credentials=create_access_token({"user_id": str(index), "user_role": "Post Master"}, 30),
+        )
+        for index in range(args.tokens)
+    ]
+
+    authentication.token_cache = VerifiedTokenCache(0)
+    uncached = run(credentials, args.calls)
+    authentication.token_cache = VerifiedTokenCache(args.tokens)
+    cached = run(credentials, args.calls)
+
+    print(f"decode_jwt without cache: {uncached * 1e6:8.2f} us/call")
+    print(f"decode_jwt with cache   : {cached * 1e6:8.2f} us/call  {authentication.token_cache.stats()}")
+    print(f"speedup                 : {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,8 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from fastapi import Depends, HTTPException, status
@@ -8,11 +13,91 @@ from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from sqlalchemy import select
 
+from common.metrics import timed_dependency
 from config.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+class BoundedExecutor:
+    """
+    Runs blocking calls on a small thread pool so they don't stall the event loop.
+
+    At most `workers` calls run at once and at most `max_queued` more wait for a thread; beyond that callers
+    get a 503 straight away instead of piling up. With `workers` set to 0 calls run inline on the loop.
+    """
+
+    def __init__(self, workers: int, max_queued: int, name: str):
+        self.workers = workers
+        self.max_pending = workers + max_queued
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name) if workers else None
+
+    async def run(self, func, *args):
+        if self._executor is None:
+            return func(*args)
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+
+password_executor = BoundedExecutor(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_DEPTH, "password-hash"
+)
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of tokens that already passed verification, keyed by the raw token.
+
+    Only tokens carrying an `exp` claim are cached and an entry is dropped as soon as `exp` is reached, so a
+    cached token is never accepted after `decode` would have rejected it.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[token]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, token: str, claims: dict):
+        if not self.max_size or not isinstance(claims.get("exp"), (int, float)):
+            return
+        with self._lock:
+            self._entries[token] = (claims["exp"], dict(claims))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_SIZE)
+
+
 def encode_jwt(user_id):
     try:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -30,21 +115,26 @@ def encode_jwt(user_id):
 def decode_jwt(
     token: HTTPAuthorizationCredentials = Depends(HTTPBearer(auto_error=False)),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Bearer authentication required",
-            headers={"WWW-Authenticate": 'Bearer realm="auth_required"'},
-        )
-    try:
-        decoded_token = decode(token.credentials, algorithms=settings.ALGORITHM, key=settings.SECRET_KEY)
-    except Exception as err:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Invalid authentication credentials. {err}",
-            headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
-        ) from err
-    return decoded_token
+    with timed_dependency("decode_jwt"):
+        if token is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Bearer authentication required",
+                headers={"WWW-Authenticate": 'Bearer realm="auth_required"'},
+            )
+        decoded_token = token_cache.get(token.credentials)
+        if decoded_token is not None:
+            return decoded_token
+        try:
+            decoded_token = decode(token.credentials, algorithms=settings.ALGORITHM, key=settings.SECRET_KEY)
+        except Exception as err:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Invalid authentication credentials. {err}",
+                headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+            ) from err
+        token_cache.put(token.credentials, decoded_token)
+        return decoded_token
 
 
 def create_access_token(data: dict, expires_delta: int):
@@ -54,8 +144,12 @@ def create_access_token(data: dict, expires_delta: int):
     return encoded_jwt
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_executor.run(pwd_context.verify, plain_password, hashed_password)
+
+
+async def hash_password(plain_password):
+    return await password_executor.run(pwd_context.hash, plain_password)
 
 
 async def get_user_by_username(db: Session, username: str):
@@ -65,7 +159,7 @@ async def get_user_by_username(db: Session, username: str):
 
 
 async def _create_user(db: Session, username: str, password: str, role: str):
-    hashed_password = pwd_context.hash(password)
+    hashed_password = await hash_password(password)
     db_user = User(username=username, password=hashed_password, role=role)
     db.add(db_user)
     await db.commit()  # noqa
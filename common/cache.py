@@ -0,0 +1,103 @@
+import importlib
+import json
+import time
+from collections import OrderedDict
+
+from common.events import STATUS_CHANNEL, listener
+from config.config import settings
+
+
+class LocalCacheBackend:
+    """
+    In-process LRU with per-entry expiry. Any object exposing the same `get`/`set`/`delete`/`clear` methods,
+    such as a client for a shared store, can be configured in its place through TRAIN_CACHE_BACKEND.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class TrainCache:
+    """
+    Read-through cache of per-train views (capacity/cost and status), invalidated on every train mutation.
+
+    The process making a change invalidates its own entries right away; every other worker drops them when
+    the change's `train` event arrives on the `status_changed` channel (see `common.events.publish`).
+    """
+
+    VIEWS = ("capacity-cost", "status")
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(train_id: str, view: str) -> str:
+        return f"train:{train_id}:{view}"
+
+    def get(self, train_id: str, view: str):
+        value = self.backend.get(self._key(train_id, view))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, train_id: str, view: str, value):
+        self.backend.set(self._key(train_id, view), value, self.ttl)
+
+    def invalidate(self, *train_ids: str):
+        self.backend.delete(*(self._key(train_id, view) for train_id in train_ids for view in self.VIEWS))
+
+    def start(self):
+        listener.subscribe(STATUS_CHANNEL, self.on_status_changed)
+
+    def stop(self):
+        listener.unsubscribe(STATUS_CHANNEL, self.on_status_changed)
+
+    def on_status_changed(self, payload):
+        if payload is None:
+            # Notifications sent while the listener was reconnecting are lost, so nothing cached can be trusted.
+            self.backend.clear()
+            return
+        message = json.loads(payload)
+        if message["kind"] == "train":
+            self.invalidate(*(event["id"] for event in message["events"]))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def _load_backend(path: str):
+    module_name, class_name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)(settings.TRAIN_CACHE_SIZE)
+
+
+train_cache = TrainCache(_load_backend(settings.TRAIN_CACHE_BACKEND), settings.TRAIN_CACHE_TTL_SECONDS)
@@ -12,3 +12,10 @@ class TrainStatus(str, PEnum):
     BOOKED = "Booked"
     SENT = "Sent"
     UNAVAILABLE = "Unavailable"
+
+
+class JobStatus(str, PEnum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    SUCCEEDED = "Succeeded"
+    FAILED = "Failed"
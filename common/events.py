@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import asyncpg
+from sqlalchemy import String, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANNEL = "status_changed"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+NOTIFY_PAYLOAD_LIMIT = 7_900
+
+
+def asyncpg_dsn(url: str) -> str:
+    """
+    Turn a SQLAlchemy `postgresql+asyncpg://` URL into a DSN asyncpg can connect with.
+    """
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class PgListener:
+    """
+    One dedicated connection per process that LISTENs on Postgres channels and dispatches notifications to
+    in-process callbacks, so features relying on NOTIFY do not each hold a pooled connection.
+
+    Callbacks are plain functions called on the event loop with the notification payload. After a
+    reconnect they are called once with `None`, since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, dsn: str, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._callbacks = defaultdict(list)
+        self._connection = None
+        self._task = None
+
+    def subscribe(self, channel: str, callback):
+        self._callbacks[channel].append(callback)
+        if self._connection is not None and not self._connection.is_closed():
+            if len(self._callbacks[channel]) == 1:
+                asyncio.get_running_loop().create_task(self._connection.add_listener(channel, self._dispatch))
+
+    def unsubscribe(self, channel: str, callback):
+        if callback in self._callbacks.get(channel, ()):
+            self._callbacks[channel].remove(callback)
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for callback in list(self._callbacks.get(channel, ())):
+            try:
+                callback(payload)
+            except Exception:  # noqa
+                logger.exception("Notification callback for %s failed", channel)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _run(self):
+        reconnected = False
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                self._connection.add_termination_listener(lambda connection: lost.set())
+                for channel in list(self._callbacks):
+                    await self._connection.add_listener(channel, self._dispatch)
+                if reconnected:
+                    for channel in list(self._callbacks):
+                        self._dispatch(self._connection, None, channel, None)
+                reconnected = True
+                await lost.wait()
+                logger.warning("Notification connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa
+                logger.exception("Notification connection failed")
+            await asyncio.sleep(self.reconnect_delay)
+
+
+def notification_payloads(kind: str, events: list, limit: int = NOTIFY_PAYLOAD_LIMIT) -> list:
+    """
+    Split status events into as few `{"kind": ..., "events": [...]}` JSON payloads as fit under `limit` bytes.
+    """
+    payloads, chunk, size = [], [], 0
+    overhead = len(json.dumps({"kind": kind, "events": []}))
+    for event in events:
+        encoded = json.dumps(event, default=str)
+        if chunk and overhead + size + len(chunk) + len(encoded) > limit:
+            payloads.append(chunk)
+            chunk, size = [], 0
+        chunk.append(encoded)
+        size += len(encoded)
+    if chunk:
+        payloads.append(chunk)
+    return [f'{{"kind": {json.dumps(kind)}, "events": [{",".join(chunk)}]}}' for chunk in payloads]
+
+
+async def publish(db: Session, kind: str, events: list):
+    """
+    Announce `kind` ("parcel" or "train") status changes to every worker. Each event is a dict with the
+    object's `id` and the fields that changed. Postgres delivers the notifications when `db` commits, so
+    a rolled back change is never announced.
+    """
+    payloads = notification_payloads(kind, events)
+    if payloads:
+        notifications = func.unnest(literal(payloads, ARRAY(String))).table_valued("payload").render_derived()
+        await db.execute(select(func.pg_notify(STATUS_CHANNEL, notifications.c.payload)))  # noqa
+
+
+listener = PgListener(asyncpg_dsn(settings.DATABASE_URL))
@@ -0,0 +1,296 @@
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from common.enums import TrainStatus
+from common.events import listener
+from config.config import settings
+from database.db import SessionLocal
+from models.train import Train
+
+logger = logging.getLogger(__name__)
+
+FLEET_CHANNEL = "fleet_changed"
+MAGIC = b"FLEETSNP"
+_PREFIX = struct.Struct("<8sQ")
+_ALIGNMENT = 64
+
+
+def available_fleet():
+    """
+    Rows of the available fleet in the shape `FleetSnapshot.build` expects.
+    """
+    return select(
+        Train.id,
+        Train.weight_cost_factor,
+        Train.volume_cost_factor,
+        Train.max_weight - Train.current_weight,
+        Train.max_volume - Train.current_volume,
+        Train.lines,
+    ).where(Train.status == TrainStatus.AVAILABLE)
+
+
+class FleetSnapshot:
+    """
+    Read-only, array-backed view of the available fleet: train ids, cost factors, free capacity and one
+    bitmask of served lines per train.
+
+    Snapshots loaded with `open` are views over a memory-mapped file, so every worker process shares the same
+    page-cache copy instead of holding its own.
+    """
+
+    def __init__(self, arrays: dict, version: int, built_at: float, buffer=None):
+        self.ids = arrays["ids"]
+        self.line_names = arrays["line_names"]
+        self.weight_cost_factors = arrays["weight_cost_factors"]
+        self.volume_cost_factors = arrays["volume_cost_factors"]
+        self.free_weights = arrays["free_weights"]
+        self.free_volumes = arrays["free_volumes"]
+        self.line_bits = arrays["line_bits"]
+        self.version = version
+        self.built_at = built_at
+        self._buffer = buffer
+        self._line_index = {name.decode("utf-8"): bit for bit, name in enumerate(self.line_names.tolist())}
+
+    def __len__(self):
+        return self.ids.size
+
+    def train_id(self, index: int) -> str:
+        return self.ids[index].decode("utf-8")
+
+    def serves(self, destination: str) -> np.ndarray:
+        """
+        Boolean mask of the trains serving `destination`.
+        """
+        bit = self._line_index.get(destination)
+        if bit is None:
+            return np.zeros(len(self), dtype=bool)
+        word, offset = divmod(bit, 64)
+        return ((self.line_bits[:, word] >> np.uint64(offset)) & np.uint64(1)).astype(bool)
+
+    def line_matrix(self, destinations: list) -> np.ndarray:
+        """
+        Boolean `(destinations, trains)` matrix in the layout `cheapest_trains` expects.
+        """
+        return np.array([self.serves(destination) for destination in destinations], dtype=bool).reshape(
+            len(destinations), len(self)
+        )
+
+    def cheapest(self, weight: float, volume: float, destination: str):
+        """
+        Returns:
+        - tuple: `(train_id, cost)` of the cheapest train serving `destination`, or None.
+        """
+        costs = self.weight_cost_factors * weight + self.volume_cost_factors * volume
+        costs[~self.serves(destination)] = np.inf
+        if not costs.size:
+            return None
+        best = int(costs.argmin())
+        if not np.isfinite(costs[best]):
+            return None
+        return self.train_id(best), float(costs[best])
+
+    def train_lines(self) -> list:
+        """
+        Names of the lines each train serves, in train order.
+        """
+        names = [name.decode("utf-8") for name in self.line_names.tolist()]
+        bits = np.unpackbits(self.line_bits.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+        trains, lines = np.nonzero(bits[:, :len(names)])
+        served = [[] for _ in range(len(self))]
+        for train, line in zip(trains.tolist(), lines.tolist()):
+            served[train].append(names[line])
+        return served
+
+    @classmethod
+    def build(cls, trains: list, version: int):
+        """
+        Build a snapshot from `(id, weight_cost_factor, volume_cost_factor, free_weight, free_volume, lines)` rows.
+        """
+        line_names = sorted({line for train in trains for line in train[5]})
+        bit_of = {name: bit for bit, name in enumerate(line_names)}
+        line_bits = np.zeros((len(trains), max(1, -(-len(line_names) // 64))), dtype=np.uint64)
+        for index, train in enumerate(trains):
+            for line in train[5]:
+                word, offset = divmod(bit_of[line], 64)
+                line_bits[index, word] |= np.uint64(1) << np.uint64(offset)
+
+        arrays = {
+            # Encoded explicitly: numpy encodes `str` to `bytes` as ASCII, which fails on non-ASCII ids and lines.
+            "ids": np.array([train[0].encode("utf-8") for train in trains], dtype=bytes),
+            "line_names": np.array([name.encode("utf-8") for name in line_names], dtype=bytes),
+            "weight_cost_factors": np.array([train[1] for train in trains], dtype=np.float64),
+            "volume_cost_factors": np.array([train[2] for train in trains], dtype=np.float64),
+            "free_weights": np.array([train[3] for train in trains], dtype=np.float64),
+            "free_volumes": np.array([train[4] for train in trains], dtype=np.float64),
+            "line_bits": line_bits,
+        }
+        return cls(arrays, version, time.time())
+
+    def write(self, path: str):
+        """
+        Publish the snapshot atomically: readers keep their current mapping until they notice the new file.
+        """
+        arrays = {
+            "ids": self.ids,
+            "line_names": self.line_names,
+            "weight_cost_factors": self.weight_cost_factors,
+            "volume_cost_factors": self.volume_cost_factors,
+            "free_weights": self.free_weights,
+            "free_volumes": self.free_volumes,
+            "line_bits": self.line_bits,
+        }
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+        header = json.dumps({"version": self.version, "built_at": self.built_at, "arrays": layout}).encode()
+        data_start = -(-(_PREFIX.size + len(header)) // _ALIGNMENT) * _ALIGNMENT
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as output:
+            output.write(_PREFIX.pack(MAGIC, len(header)) + header)
+            for name, array in arrays.items():
+                output.seek(data_start + layout[name]["offset"])
+                output.write(np.ascontiguousarray(array).tobytes())
+            output.truncate(data_start + offset)
+        os.replace(temporary, path)
+
+    @classmethod
+    def open(cls, path: str):
+        with open(path, "rb") as snapshot_file:
+            buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _PREFIX.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a fleet snapshot")
+        header = json.loads(buffer[_PREFIX.size:_PREFIX.size + header_size])
+        data_start = -(-(_PREFIX.size + header_size) // _ALIGNMENT) * _ALIGNMENT
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            if not count:
+                arrays[name] = np.empty(spec["shape"], dtype=dtype)
+                continue
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=data_start + spec["offset"]
+            ).reshape(spec["shape"])
+        return cls(arrays, header["version"], header["built_at"], buffer)
+
+
+class FleetSnapshots:
+    """
+    Keeps a fleet snapshot published at `path` for every worker process on the host.
+
+    One process, elected with an exclusive lock on `<path>.lock`, rebuilds the snapshot whenever Postgres
+    sends a `fleet_changed` notification (raised by a trigger on every `trains` write) and at least every
+    `max_age / 2` seconds. Every process maps the published file read-only and re-maps it when it is
+    replaced. `current()` returns None when no snapshot younger than `max_age` exists, so callers fall back
+    to the database instead of quoting from a stale fleet.
+    """
+
+    def __init__(self, path: str, max_age: float, debounce: float, enabled: bool = True):
+        self.enabled = enabled
+        self.path = path
+        self.max_age = max_age
+        self.debounce = debounce
+        self._snapshot = None
+        self._identity = None
+        self._lock_file = None
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def _load(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        if identity != self._identity:
+            try:
+                self._snapshot = FleetSnapshot.open(self.path)
+            except (OSError, ValueError):
+                logger.exception("Could not map the fleet snapshot")
+                return None
+            self._identity = identity
+        return self._snapshot
+
+    def current(self):
+        if not self.enabled:
+            return None
+        snapshot = self._load()
+        if snapshot is None or time.time() - snapshot.built_at > self.max_age:
+            return None
+        return snapshot
+
+    def notify(self, payload=None):
+        self._changed.set()
+
+    def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        listener.unsubscribe(FLEET_CHANNEL, self.notify)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _try_lead(self) -> bool:
+        lock_file = open(f"{self.path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def rebuild(self):
+        async with SessionLocal() as db:
+            trains = await db.execute(available_fleet())  # noqa
+            trains = trains.all()
+        previous = self._load()
+        version = previous.version + 1 if previous else 1
+        FleetSnapshot.build(trains, version).write(self.path)
+
+    async def _run(self):
+        # Followers only re-try the election; they read whatever the leader publishes.
+        while not self._try_lead():
+            await asyncio.sleep(self.max_age / 2)
+
+        listener.subscribe(FLEET_CHANNEL, self.notify)
+        while True:
+            self._changed.clear()
+            try:
+                await self.rebuild()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa
+                logger.exception("Fleet snapshot rebuild failed")
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.max_age / 2)
+                # Coalesce the burst of notifications a booking or a plan produces into one rebuild.
+                await asyncio.sleep(self.debounce)
+            except asyncio.TimeoutError:
+                pass
+
+
+fleet_snapshots = FleetSnapshots(
+    settings.FLEET_SNAPSHOT_PATH,
+    settings.FLEET_SNAPSHOT_MAX_AGE_SECONDS,
+    settings.FLEET_SNAPSHOT_DEBOUNCE_SECONDS,
+    settings.FLEET_SNAPSHOT_ENABLED,
+)
@@ -1,34 +1,423 @@
+import time
+import uuid
 from datetime import datetime
 
-from sqlalchemy import select
+import numpy as np
+from sqlalchemy import String, any_, func, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.orm import Session
 
+from common.cache import train_cache
 from common.enums import TrainStatus
+from common.events import publish
+from common.fleet import fleet_snapshots
+from common.packing import cheapest_trains, greedy_fill, plan_fleet, shipping_costs
+from config.config import settings
+from models.backlog import DestinationBacklog
 from models.parcel import Parcel
 from models.train import Train
 
 
-async def assign_parcels_to_train(db: Session, train: Train):
-    available_parcels = await db.execute(select(Parcel).where(Parcel.train_id.is_(None)))  # noqa
-    available_parcels = available_parcels.scalars().all()
+def any_of(column, values):
+    """
+    Build a `column = ANY(:values)` predicate that binds the values as a single array parameter.
+    """
+    return column == any_(literal(list(values), ARRAY(String)))
 
-    parcels_with_costs = [(parcel, parcel.calculate_shipping_cost(train)) for parcel in available_parcels]
 
-    sorted_parcels = sorted(parcels_with_costs, key=lambda x: x[1])
+BACKLOG_COLUMNS = ("destination", "pending_count", "pending_weight", "pending_volume", "updated_at")
 
-    for parcel, _ in sorted_parcels:
-        if (
-                train.current_weight + parcel.weight <= train.max_weight and
-                train.current_volume + parcel.volume <= train.max_volume
-        ):
-            train.current_weight += parcel.weight
-            train.current_volume += parcel.volume
-            parcel.train_id = train.id
-            train.status = TrainStatus.BOOKED
-            train.updated_at = datetime.now()
 
-            train.cost += parcel.calculate_shipping_cost(train)
+def _accumulate_backlog(statement):
+    return statement.on_conflict_do_update(
+        index_elements=[DestinationBacklog.destination],
+        set_={
+            "pending_count": DestinationBacklog.pending_count + statement.excluded.pending_count,
+            "pending_weight": DestinationBacklog.pending_weight + statement.excluded.pending_weight,
+            "pending_volume": DestinationBacklog.pending_volume + statement.excluded.pending_volume,
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
 
-            await db.commit()  # noqa
 
-    return "Parcel assignment completed successfully"
+async def adjust_backlog(db: Session, parcels, sign: int = 1):
+    """
+    Add (`sign=1`) or remove (`sign=-1`) parcels, given as `(destination, weight, volume)` tuples, from the
+    per-destination backlog totals within the caller's transaction.
+    """
+    totals = {}
+    for destination, weight, volume in parcels:
+        count, total_weight, total_volume = totals.get(destination, (0, 0.0, 0.0))
+        totals[destination] = (count + sign, total_weight + sign * weight, total_volume + sign * volume)
+    if not totals:
+        return
+
+    # Backlog rows are always locked in destination order, so concurrent bookings cannot deadlock on them.
+    now = datetime.now()
+    await db.execute(_accumulate_backlog(insert(DestinationBacklog).values([  # noqa
+        dict(zip(BACKLOG_COLUMNS, (destination, *total, now))) for destination, total in sorted(totals.items())
+    ])))
+
+
+async def bulk_assign_parcels(db: Session, train_id: str, parcel_ids: list) -> list:
+    """
+    Assign the given parcels that are still unassigned and active to the train.
+
+    The backlog is left to the caller: it removes the returned `(destination, weight, volume)` rows with one
+    `adjust_backlog(..., sign=-1)` right before committing, so the backlog rows are locked once, in
+    destination order, and only for the end of the transaction.
+    """
+    assigned = await db.execute(  # noqa
+        update(Parcel)
+        .where(any_of(Parcel.id, parcel_ids), Parcel.train_id.is_(None), Parcel.is_active)
+        .values(train_id=train_id)
+        .returning(Parcel.id, Parcel.destination, Parcel.weight, Parcel.volume)
+        .execution_options(synchronize_session=False)
+    )
+    assigned = assigned.all()
+    await publish(db, "parcel", [{"id": parcel.id, "train_id": train_id} for parcel in assigned])
+    return [(parcel.destination, parcel.weight, parcel.volume) for parcel in assigned]
+
+
+def unassigned_parcels():
+    """
+    Select the active parcels that are not assigned to a train yet.
+    """
+    return select(Parcel.id, Parcel.weight, Parcel.volume, Parcel.destination).where(
+        Parcel.train_id.is_(None), Parcel.is_active
+    )
+
+
+def cheapest_unassigned(train: Train, free_weight: float, free_volume: float, limit: int, after: tuple = None):
+    """
+    Select up to `limit` unassigned parcels that fit in the given free capacity, cheapest on `train` first,
+    following the `(cost, id)` key `after`. The rows are read without locks.
+    """
+    shipping_cost = (Parcel.weight * train.weight_cost_factor + Parcel.volume * train.volume_cost_factor).label("cost")
+    query = select(Parcel.id, Parcel.weight, Parcel.volume, shipping_cost).where(
+        Parcel.train_id.is_(None),
+        Parcel.is_active,
+        Parcel.weight <= free_weight,
+        Parcel.volume <= free_volume,
+    )
+    if after:
+        query = query.where(tuple_(shipping_cost, Parcel.id) > tuple_(*after))
+    return query.order_by(shipping_cost, Parcel.id).limit(limit)
+
+
+def lock_unassigned(parcel_ids: list):
+    """
+    Lock the given parcels that are still unassigned and active, skipping the ones a concurrent booking holds.
+    """
+    return (
+        select(Parcel.id)
+        .where(any_of(Parcel.id, parcel_ids), Parcel.train_id.is_(None), Parcel.is_active)
+        .with_for_update(skip_locked=True)
+    )
+
+
+async def assign_parcels_to_train(db: Session, train: Train, on_progress=None) -> int:
+    """
+    Fill the train with the cheapest unassigned parcels that fit and book it.
+
+    Returns:
+    - int: The number of parcels assigned; with none the train is left AVAILABLE and nothing is committed.
+    """
+    free_weight = train.max_weight - train.current_weight
+    free_volume = train.max_volume - train.current_volume
+    batch_size = settings.ASSIGNMENT_CLAIM_BATCH_SIZE
+    claimed_weight = claimed_volume = claimed_cost = 0.0
+    assigned_count = 0
+    assigned = []
+    last_seen = None
+
+    # Parcels are read cheapest first in unlocked batches and only the ones the fill keeps are locked, with
+    # SKIP LOCKED: parallel bookings never wait on or double-assign each other's parcels, and parcels a
+    # booking turns down stay free for the others.
+    while True:
+        batch = await db.execute(cheapest_unassigned(train, free_weight, free_volume, batch_size, last_seen))  # noqa
+        rows = batch.all()
+        if not rows:
+            break
+
+        parcel_ids, weights, volumes, costs = zip(*rows)
+        weights = np.asarray(weights, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        costs = np.asarray(costs, dtype=np.float64)
+
+        candidates = np.arange(len(rows))
+        for _ in range(1 + settings.ASSIGNMENT_REFILL_ROUNDS):
+            accepted = candidates[greedy_fill(
+                weights[candidates], volumes[candidates], costs[candidates], free_weight, free_volume
+            )]
+            if not accepted.size:
+                break
+            locked = await db.execute(lock_unassigned([parcel_ids[index] for index in accepted]))  # noqa
+            locked = set(locked.scalars())
+            kept = accepted[[parcel_ids[index] in locked for index in accepted]]
+            if kept.size:
+                assigned += await bulk_assign_parcels(db, train.id, [parcel_ids[index] for index in kept])
+
+            free_weight -= float(weights[kept].sum())
+            free_volume -= float(volumes[kept].sum())
+            claimed_weight += float(weights[kept].sum())
+            claimed_volume += float(volumes[kept].sum())
+            claimed_cost += float(costs[kept].sum())
+            assigned_count += kept.size
+            if kept.size == accepted.size:
+                break
+            # Parcels claimed by a concurrent booking left room: fill it from the rest of the batch, a bounded
+            # number of times, since bookings racing for the same cheapest parcels keep losing some.
+            candidates = np.setdiff1d(candidates, accepted, assume_unique=True)
+            if not candidates.size:
+                break
+
+        last_seen = (rows[-1].cost, rows[-1].id)
+        if on_progress:
+            await on_progress(assigned_count)
+        if len(rows) < batch_size:
+            break
+
+    # A train that got no parcel stays AVAILABLE for a later fill instead of leaving BOOKED and empty.
+    if not assigned_count:
+        return 0
+
+    train.current_weight += claimed_weight
+    train.current_volume += claimed_volume
+    train.cost = (train.cost or 0) + claimed_cost
+    train.status = TrainStatus.BOOKED
+    train.updated_at = datetime.now()
+    await publish(db, "train", [{"id": train.id, "status": train.status}])
+
+    await adjust_backlog(db, assigned, sign=-1)
+    await db.commit()  # noqa
+    train_cache.invalidate(train.id)
+
+    return assigned_count
+
+
+NOTHING_TO_SHIP = "No unassigned parcel fits on the train"
+
+
+async def book_fill_send(db: Session, train: Train, on_progress=None) -> int:
+    # The assignment already adds the parcels' weight, volume and cost to the train. The train is left
+    # BOOKED: the departure scheduler gives it a line and a slot that respects the headway, then sends it
+    # and marks its parcels shipped, exactly as for trains booked through the fleet planner. When no parcel
+    # is assigned, 0 is returned and callers report NOTHING_TO_SHIP.
+    return await assign_parcels_to_train(db, train, on_progress)
+
+
+async def plan_parcels_for_fleet(db: Session, post_master_id: str, dry_run: bool = False):
+    trains = select(
+        Train.id,
+        Train.weight_cost_factor,
+        Train.volume_cost_factor,
+        (Train.max_weight - Train.current_weight).label("free_weight"),
+        (Train.max_volume - Train.current_volume).label("free_volume"),
+        Train.lines,
+    ).where(Train.status == TrainStatus.AVAILABLE, Train.operator_id != post_master_id)
+    parcels = unassigned_parcels()
+    if not dry_run:
+        # Skip trains a concurrent booking is working on. Parcels are read without locks: only the ones a
+        # train accepts are locked, below, so the plan never holds the whole backlog.
+        trains = trains.with_for_update(skip_locked=True)
+
+    trains = await db.execute(trains)  # noqa
+    trains = trains.all()
+    parcels = await db.execute(parcels)  # noqa
+    parcels = parcels.all()
+
+    plan = {"dry_run": dry_run, "truncated": False, "assignments": [], "unassigned_parcels": len(parcels)}
+    if not trains or not parcels:
+        return plan
+
+    parcel_ids, weights, volumes, destinations = zip(*parcels)
+    weights = np.asarray(weights, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    destination_names, destination_codes = np.unique(np.asarray(destinations, dtype=object), return_inverse=True)
+    code_of = {name: code for code, name in enumerate(destination_names.tolist())}
+
+    fleet = [
+        {
+            "weight_cost_factor": train.weight_cost_factor,
+            "volume_cost_factor": train.volume_cost_factor,
+            "free_weight": train.free_weight,
+            "free_volume": train.free_volume,
+            "line_codes": [code_of[line] for line in train.lines if line in code_of],
+        }
+        for train in trains
+    ]
+
+    deadline = time.perf_counter() + settings.PLANNER_TIME_BUDGET_SECONDS
+    assignments, plan["truncated"] = plan_fleet(weights, volumes, destination_codes, fleet, deadline)
+
+    now = datetime.now()
+    assigned = []
+    for train, accepted in zip(trains, assignments):
+        if accepted.size and not dry_run:
+            # Parcels claimed or withdrawn since they were read are dropped from this train's share.
+            claimed = await db.execute(lock_unassigned([parcel_ids[index] for index in accepted]))  # noqa
+            claimed = set(claimed.scalars())
+            if len(claimed) < accepted.size:
+                accepted = accepted[[parcel_ids[index] in claimed for index in accepted]]
+        if not accepted.size:
+            continue
+        entry = {
+            "train_id": train.id,
+            "parcel_ids": [parcel_ids[index] for index in accepted],
+            "weight": float(weights[accepted].sum()),
+            "volume": float(volumes[accepted].sum()),
+            "cost": float(shipping_costs(
+                weights[accepted], volumes[accepted], train.weight_cost_factor, train.volume_cost_factor
+            ).sum()),
+        }
+        plan["assignments"].append(entry)
+        plan["unassigned_parcels"] -= accepted.size
+
+        if dry_run:
+            continue
+        assigned += await bulk_assign_parcels(db, train.id, entry["parcel_ids"])
+        await db.execute(  # noqa
+            update(Train)
+            .where(Train.id == train.id)
+            .values(
+                current_weight=Train.current_weight + entry["weight"],
+                current_volume=Train.current_volume + entry["volume"],
+                cost=func.coalesce(Train.cost, 0) + entry["cost"],
+                status=TrainStatus.BOOKED,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    if not dry_run:
+        await publish(db, "train", [
+            {"id": entry["train_id"], "status": TrainStatus.BOOKED} for entry in plan["assignments"]
+        ])
+        await adjust_backlog(db, assigned, sign=-1)
+        await db.commit()  # noqa
+        train_cache.invalidate(*(entry["train_id"] for entry in plan["assignments"]))
+
+    return plan
+
+
+async def quote_parcels(db: Session, owner_id: str, parcel_ids: list, parcels: list):
+    found = {}
+    if parcel_ids:
+        query = await db.execute(  # noqa
+            select(Parcel.id, Parcel.weight, Parcel.volume, Parcel.destination)
+            .where(any_of(Parcel.id, parcel_ids), Parcel.owner_id == owner_id, Parcel.is_active)
+        )
+        found = {row.id: row for row in query.all()}
+
+    quoted = [(parcel_id, found[parcel_id]) for parcel_id in parcel_ids if parcel_id in found]
+    quoted += [(None, parcel) for parcel in parcels]
+    quotes = {
+        parcel_id: {
+            "parcel_id": parcel_id,
+            "minimal_shipping_cost": None,
+            "by_train": None,
+            "detail": "Parcel not found"
+        }
+        for parcel_id in parcel_ids if parcel_id not in found
+    }
+    if not quoted:
+        return [quotes[parcel_id] for parcel_id in parcel_ids]
+
+    destination_names = sorted({parcel.destination for _, parcel in quoted})
+    code_of = {name: code for code, name in enumerate(destination_names)}
+    snapshot = fleet_snapshots.current()
+    if snapshot is not None:
+        train_id_at = snapshot.train_id
+        weight_cost_factors = snapshot.weight_cost_factors
+        volume_cost_factors = snapshot.volume_cost_factors
+        line_matrix = snapshot.line_matrix(destination_names)
+    else:
+        trains = await db.execute(  # noqa
+            select(Train.id, Train.weight_cost_factor, Train.volume_cost_factor, Train.lines)
+            .where(Train.status == TrainStatus.AVAILABLE, Train.lines.overlap(destination_names))
+        )
+        trains = trains.all()
+
+        def train_id_at(index):
+            return trains[index].id
+
+        weight_cost_factors = np.fromiter((train.weight_cost_factor for train in trains), dtype=np.float64)
+        volume_cost_factors = np.fromiter((train.volume_cost_factor for train in trains), dtype=np.float64)
+        line_matrix = np.zeros((len(destination_names), len(trains)), dtype=bool)
+        for index, train in enumerate(trains):
+            line_matrix[[code_of[line] for line in train.lines if line in code_of], index] = True
+
+    train_indices, costs = cheapest_trains(
+        np.fromiter((parcel.weight for _, parcel in quoted), dtype=np.float64, count=len(quoted)),
+        np.fromiter((parcel.volume for _, parcel in quoted), dtype=np.float64, count=len(quoted)),
+        np.fromiter((code_of[parcel.destination] for _, parcel in quoted), dtype=np.intp, count=len(quoted)),
+        weight_cost_factors,
+        volume_cost_factors,
+        line_matrix,
+    )
+
+    results = []
+    for (parcel_id, _), train_index, cost in zip(quoted, train_indices.tolist(), costs.tolist()):
+        quote = {"parcel_id": parcel_id, "minimal_shipping_cost": None, "by_train": None, "detail": None}
+        if train_index < 0:
+            quote["detail"] = "Trains are currently unavailable"
+        else:
+            quote["minimal_shipping_cost"] = cost
+            quote["by_train"] = train_id_at(train_index)
+        if parcel_id is None:
+            results.append(quote)
+        else:
+            quotes[parcel_id] = quote
+
+    return [quotes[parcel_id] for parcel_id in parcel_ids] + results
+
+
+PARCEL_COPY_COLUMNS = (
+    "id", "created_at", "updated_at", "is_active", "owner_id", "weight", "volume", "destination", "origin",
+    "has_shipped",
+)
+
+
+async def copy_parcels(db: Session, records: list):
+    # The backlog goes first: the driver only opens the session's transaction on its first statement, and a
+    # COPY issued before that would commit on its own, leaving the parcels in without their backlog entry.
+    await adjust_backlog(db, ((destination, weight, volume) for *_, weight, volume, destination, _, _ in records))
+    connection = await db.connection()  # noqa
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        Parcel.__tablename__, records=records, columns=PARCEL_COPY_COLUMNS
+    )
+    await db.commit()  # noqa
+
+
+async def ingest_parcels(db: Session, owner_id: str, rows):
+    started = time.perf_counter()
+    summary = {"received": 0, "inserted": 0, "rejected": 0, "errors": []}
+    records = []
+
+    async for line_number, parcel, error in rows:
+        summary["received"] += 1
+        if error:
+            summary["rejected"] += 1
+            if len(summary["errors"]) < settings.MAX_BULK_INGEST_ERRORS:
+                summary["errors"].append({"line": line_number, "error": error})
+            continue
+
+        now = datetime.now()
+        records.append(
+            (str(uuid.uuid4()), now, now, True, owner_id, parcel.weight, parcel.volume, parcel.destination,
+             parcel.origin, False)
+        )
+        if len(records) >= settings.BULK_INGEST_CHUNK_SIZE:
+            await copy_parcels(db, records)
+            summary["inserted"] += len(records)
+            records = []
+
+    if records:
+        await copy_parcels(db, records)
+        summary["inserted"] += len(records)
+
+    summary["elapsed_seconds"] = time.perf_counter() - started
+    summary["rows_per_second"] = summary["received"] / summary["elapsed_seconds"] if summary["received"] else 0.0
+    return summary
@@ -0,0 +1,60 @@
+import csv
+import json
+
+from pydantic import ValidationError
+
+from schemas.parcel import ParcelCreate
+
+
+async def iter_lines(chunks):
+    """
+    Split an async stream of byte chunks into numbered, decoded lines without buffering the whole body.
+    """
+    line_number = 0
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line.rstrip(b"\r").decode("utf-8", errors="replace")
+    if pending:
+        yield line_number + 1, pending.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+def _describe(err: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in err.errors()
+    )
+
+
+async def iter_parcel_rows(chunks, content_type: str):
+    """
+    Parse an NDJSON (default) or CSV upload into parcels, validating each row against `ParcelCreate`.
+
+    CSV uploads must start with a header line naming the `ParcelCreate` fields; quoted fields spanning
+    several lines are not supported.
+
+    Yields:
+    - tuple: `(line_number, parcel, error)` where exactly one of `parcel` and `error` is set.
+    """
+    is_csv = "csv" in (content_type or "")
+    header = None
+    async for line_number, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            if is_csv:
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [value.strip() for value in values]
+                    continue
+                row = dict(zip(header, values))
+            else:
+                row = json.loads(line)
+            yield line_number, ParcelCreate.model_validate(row), None
+        except ValidationError as err:
+            yield line_number, None, _describe(err)
+        except ValueError as err:
+            yield line_number, None, f"Malformed row: {err}"
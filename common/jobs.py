@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+
+from common.enums import JobStatus, TrainStatus
+from common.helpers import NOTHING_TO_SHIP, book_fill_send
+from common.scheduler import departure_scheduler
+from config.config import settings
+from database.db import SessionLocal
+from models.job import BookingJob
+from models.train import Train
+from schemas.train import TrainResponse
+
+logger = logging.getLogger(__name__)
+
+
+class BookingWorkerPool:
+    """
+    Background workers that run queued book-fill-send jobs off the request path.
+
+    Jobs are claimed from the `booking_jobs` table with SKIP LOCKED, so several pools (one per API worker
+    process) can share the queue. While a job runs, its worker refreshes `updated_at` every third of
+    BOOKING_JOB_STALE_SECONDS, so a RUNNING job whose heartbeat is older than that belongs to a dead worker
+    and is claimed again. Every claim bumps the job's `attempt`, and a run only updates the job while it
+    holds the latest attempt, so a run that lost its claim can never overwrite the outcome.
+    """
+
+    def __init__(self, workers: int, poll_interval: float, stale_after: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _work(self):
+        while True:
+            try:
+                claim = await self._claim()
+                # A job handed back because its train was locked is retried after the poll interval.
+                if claim and await self._run(*claim):
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa
+                logger.exception("Booking worker failed to process the queue")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self):
+        stale_before = datetime.now() - timedelta(seconds=self.stale_after)
+        async with SessionLocal() as db:
+            query = await db.execute(  # noqa
+                select(BookingJob)
+                .where(or_(
+                    BookingJob.status == JobStatus.QUEUED,
+                    and_(BookingJob.status == JobStatus.RUNNING, BookingJob.updated_at < stale_before),
+                ))
+                .order_by(BookingJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = query.scalars().first()
+            if not job:
+                return None
+            job.status = JobStatus.RUNNING
+            job.attempt += 1
+            job.updated_at = datetime.now()
+            await db.commit()  # noqa
+            return job.id, job.attempt
+
+    @staticmethod
+    async def _finish(job_id: str, attempt: int, **values) -> bool:
+        """
+        Update a RUNNING job if `attempt` is still its latest claim.
+
+        Returns:
+        - bool: False when the job was claimed again or already finished, and so was left untouched.
+        """
+        async with SessionLocal() as db:
+            updated = await db.execute(  # noqa
+                update(BookingJob)
+                .where(BookingJob.id == job_id, BookingJob.status == JobStatus.RUNNING, BookingJob.attempt == attempt)
+                .values(updated_at=datetime.now(), **values)
+            )
+            await db.commit()  # noqa
+            return bool(updated.rowcount)
+
+    async def _heartbeat(self, job_id: str, attempt: int):
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            if not await self._finish(job_id, attempt):
+                return
+
+    async def _run(self, job_id: str, attempt: int) -> bool:
+        """
+        Book the job's train, unless another booking holds it.
+
+        Returns:
+        - bool: False when the job was handed back to the queue, True otherwise.
+        """
+        async def report_progress(parcels_assigned: int):
+            await self._finish(job_id, attempt, parcels_assigned=parcels_assigned)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, attempt))
+        try:
+            async with SessionLocal() as db:
+                job = await db.get(BookingJob, job_id)  # noqa
+                offer = select(Train).where(and_(
+                    Train.id == job.train_id,
+                    Train.operator_id != job.requested_by,
+                    Train.status == TrainStatus.AVAILABLE
+                ))
+                train = await db.execute(offer.with_for_update(skip_locked=True))  # noqa
+                train = train.scalars().first()
+                if not train:
+                    locked = await db.execute(offer.with_only_columns(Train.id))  # noqa
+                    if locked.first():
+                        # Another booking holds the train: hand the job back instead of waiting on the lock.
+                        await self._finish(job_id, attempt, status=JobStatus.QUEUED)
+                        return False
+                    await self._finish(
+                        job_id, attempt, status=JobStatus.FAILED, error="Train offer not found or not available"
+                    )
+                    return True
+
+                if not await book_fill_send(db, train, report_progress):
+                    await self._finish(job_id, attempt, status=JobStatus.FAILED, error=NOTHING_TO_SHIP)
+                    return True
+                departure_scheduler.notify()
+                result = TrainResponse.model_validate(train, from_attributes=True).model_dump(mode="json")
+            await self._finish(job_id, attempt, status=JobStatus.SUCCEEDED, result=result)
+        except Exception as err:  # noqa
+            logger.exception("Booking job %s failed", job_id)
+            await self._finish(job_id, attempt, status=JobStatus.FAILED, error=str(err))
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+        return True
+
+
+booking_workers = BookingWorkerPool(
+    settings.BOOKING_WORKERS, settings.BOOKING_JOB_POLL_SECONDS, settings.BOOKING_JOB_STALE_SECONDS
+)
@@ -0,0 +1,269 @@
+import bisect
+import logging
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+logger = logging.getLogger(__name__)
+
+# Per-request dependency timings and SQL statistics, set by `MetricsMiddleware` and filled by
+# `timed_dependency` and `record_query`.
+_dependency_timings = ContextVar("dependency_timings", default=None)
+_query_stats = ContextVar("query_stats", default=None)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of durations in seconds, cheap enough to update on every call.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+@contextmanager
+def timed_dependency(name: str):
+    """
+    Add the time spent in the block to the current request's `name` dependency timing. Outside a request
+    handled by `MetricsMiddleware` this does nothing.
+    """
+    timings = _dependency_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class QueryStats:
+    """
+    SQL statements executed on behalf of one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+        self.statements = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        self.statements[statement] += 1
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = statement
+
+    def repeated(self, threshold: int) -> list:
+        """
+        Statements executed at least `threshold` times, the usual shape of an N+1 access pattern.
+        """
+        return [(statement, count) for statement, count in self.statements.items() if count >= threshold]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.total * 1000:.2f};desc="{self.count} queries", '
+            f'db-slowest;dur={self.slowest * 1000:.2f}'
+        )
+
+
+def record_query(statement: str, elapsed: float):
+    """
+    Attribute an executed statement to the current request, if any.
+    """
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+class RequestMetrics:
+    """
+    Per-route request counters and latency histograms, keyed by method and route template.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.in_flight = 0
+        self.durations = defaultdict(lambda: Histogram(buckets))
+        self.handler_durations = defaultdict(lambda: Histogram(buckets))
+        self.dependency_durations = defaultdict(lambda: Histogram(buckets))
+        self.query_counts = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.query_durations = defaultdict(lambda: Histogram(buckets))
+        self.responses = defaultdict(int)
+        self.repeated_statements = defaultdict(int)
+
+    def observe(
+            self,
+            method: str,
+            route: str,
+            status_code: int,
+            elapsed: float,
+            dependencies: dict,
+            queries: QueryStats,
+            repeated: list,
+    ):
+        self.durations[method, route].observe(elapsed)
+        self.responses[method, route, status_code] += 1
+        for name, spent in dependencies.items():
+            self.dependency_durations[method, route, name].observe(spent)
+        self.handler_durations[method, route].observe(max(elapsed - sum(dependencies.values()), 0.0))
+        self.query_counts[method, route].observe(queries.count)
+        self.query_durations[method, route].observe(queries.total)
+        if repeated:
+            self.repeated_statements[method, route] += 1
+
+    def families(self) -> list:
+        return [
+            gauge("http_requests_in_flight", "Requests currently being served.", [({}, self.in_flight)]),
+            counter("http_responses_total", "Responses by route and status code.", [
+                ({"method": method, "route": route, "status": status_code}, count)
+                for (method, route, status_code), count in self.responses.items()
+            ]),
+            histogram("http_request_duration_seconds", "Time from request start to the end of the response.", [
+                ({"method": method, "route": route}, samples) for (method, route), samples in self.durations.items()
+            ]),
+            histogram("http_dependency_duration_seconds", "Time spent in instrumented dependencies.", [
+                ({"method": method, "route": route, "dependency": name}, samples)
+                for (method, route, name), samples in self.dependency_durations.items()
+            ]),
+            histogram(
+                "http_handler_duration_seconds",
+                "Request time outside instrumented dependencies: the handler body and response serialization.",
+                [({"method": method, "route": route}, samples)
+                 for (method, route), samples in self.handler_durations.items()],
+            ),
+            histogram("db_queries_per_request", "SQL statements executed per request.", [
+                ({"method": method, "route": route}, samples) for (method, route), samples in self.query_counts.items()
+            ]),
+            histogram("db_query_duration_per_request_seconds", "Total SQL execution time per request.", [
+                ({"method": method, "route": route}, samples)
+                for (method, route), samples in self.query_durations.items()
+            ]),
+            counter("db_suspected_n_plus_one_total", "Requests that repeated an identical SQL statement.", [
+                ({"method": method, "route": route}, count)
+                for (method, route), count in self.repeated_statements.items()
+            ]),
+        ]
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording every HTTP request in `request_metrics` under its route template, so
+    `/trains/jobs/{job_id}` is one series however many jobs are polled. Requests that match no route are
+    grouped under `unmatched`.
+
+    The SQL executed so far is reported in a `Server-Timing` header when the response starts; statements
+    run while streaming a body or closing the session only reach the metrics. A request executing the same
+    statement `repeat_threshold` times or more is logged and counted as a suspected N+1 pattern.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics, repeat_threshold: int = 10):
+        self.app = app
+        self.metrics = metrics
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        timings = {}
+        queries = QueryStats()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []), (b"server-timing", queries.server_timing().encode("latin-1"))
+                ]
+            await send(message)
+
+        timings_token = _dependency_timings.set(timings)
+        queries_token = _query_stats.set(queries)
+        self.metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.in_flight -= 1
+            _dependency_timings.reset(timings_token)
+            _query_stats.reset(queries_token)
+            # The router records the matched route in the scope it shares with the middleware stack.
+            route = scope.get("route")
+            route = route.path if route else "unmatched"
+            repeated = queries.repeated(self.repeat_threshold)
+            for statement, count in repeated:
+                logger.warning(
+                    "Suspected N+1 in %s %s, statement ran %d times: %.200s",
+                    scope["method"], route, count, " ".join(statement.split()),
+                )
+            self.metrics.observe(scope["method"], route, status_code, elapsed, timings, queries, repeated)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _family(name: str, kind: str, description: str, lines: list) -> str:
+    return "\n".join([f"# HELP {name} {description}", f"# TYPE {name} {kind}", *lines])
+
+
+def gauge(name: str, description: str, samples: list) -> str:
+    return _family(name, "gauge", description, [f"{name}{_labels(labels)} {value}" for labels, value in samples])
+
+
+def counter(name: str, description: str, samples: list) -> str:
+    return _family(name, "counter", description, [f"{name}{_labels(labels)} {value}" for labels, value in samples])
+
+
+def histogram(name: str, description: str, samples: list) -> str:
+    lines = []
+    for labels, series in samples:
+        snapshot = series.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+        lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+    return _family(name, "histogram", description, lines)
+
+
+def render(families: list) -> str:
+    """
+    Join metric families into a Prometheus text exposition.
+    """
+    return "\n".join(families) + "\n"
@@ -0,0 +1,222 @@
+import time
+
+import numpy as np
+
+
+def shipping_costs(weights: np.ndarray, volumes: np.ndarray, weight_cost_factor: float, volume_cost_factor: float):
+    """
+    Vectorized counterpart of `Parcel.calculate_shipping_cost` for a single train.
+
+    Parameters:
+    - weights (np.ndarray): Parcel weights.
+    - volumes (np.ndarray): Parcel volumes, aligned with `weights`.
+    - weight_cost_factor (float): The train's cost per unit of weight.
+    - volume_cost_factor (float): The train's cost per unit of volume.
+
+    Returns:
+    - np.ndarray: The shipping cost of every parcel on the train.
+    """
+    return weights * weight_cost_factor + volumes * volume_cost_factor
+
+
+def _scan(order: np.ndarray, weights: np.ndarray, volumes: np.ndarray, free_weight: float, free_volume: float):
+    """
+    Accept parcels in the given order while they fit, returning `(accepted, free_weight, free_volume)`.
+
+    Each round drops the parcels that no longer fit on their own and accepts the longest prefix whose
+    cumulative weight and volume fit, so the scan takes a handful of NumPy passes rather than one Python
+    iteration per parcel.
+    """
+    candidate_weights = weights[order]
+    candidate_volumes = volumes[order]
+    accepted = []
+
+    while order.size:
+        fits = (candidate_weights <= free_weight) & (candidate_volumes <= free_volume)
+        if not fits.all():
+            order = order[fits]
+            candidate_weights = candidate_weights[fits]
+            candidate_volumes = candidate_volumes[fits]
+            if not order.size:
+                break
+
+        cumulative_weights = np.cumsum(candidate_weights)
+        cumulative_volumes = np.cumsum(candidate_volumes)
+        within = (cumulative_weights <= free_weight) & (cumulative_volumes <= free_volume)
+        # The cumulative sums are monotonic, so `within` is a run of True followed by False.
+        prefix = int(within.argmin()) if not within.all() else within.size
+
+        accepted.append(order[:prefix])
+        free_weight -= cumulative_weights[prefix - 1]
+        free_volume -= cumulative_volumes[prefix - 1]
+        order = order[prefix:]
+        candidate_weights = candidate_weights[prefix:]
+        candidate_volumes = candidate_volumes[prefix:]
+
+    return accepted, free_weight, free_volume
+
+
+def greedy_fill(weights: np.ndarray, volumes: np.ndarray, costs: np.ndarray, free_weight: float, free_volume: float):
+    """
+    Cheapest-first greedy fill of one train, equivalent to scanning the parcels in ascending cost order and
+    accepting every parcel that still fits.
+
+    When the train can only take a small share of the candidates, the cheapest ones are selected with a
+    partial sort and scanned first; the rest is only ranked, in growing slices, while capacity is left.
+
+    Parameters:
+    - weights (np.ndarray): Parcel weights.
+    - volumes (np.ndarray): Parcel volumes, aligned with `weights`.
+    - costs (np.ndarray): Parcel shipping costs on the train, used for ranking.
+    - free_weight (float): Remaining weight capacity of the train.
+    - free_volume (float): Remaining volume capacity of the train.
+
+    Returns:
+    - np.ndarray: Indices of the accepted parcels, in acceptance order.
+    """
+    if not costs.size:
+        return np.empty(0, dtype=np.intp)
+
+    expected_fit = min(free_weight / max(weights.mean(), 1e-12), free_volume / max(volumes.mean(), 1e-12))
+    head_size = int(2 * expected_fit) + 1024
+    remaining = np.arange(costs.size)
+    accepted = []
+
+    while remaining.size:
+        if head_size * 4 >= remaining.size:
+            order = remaining[np.argsort(costs[remaining], kind="stable")]
+            accepted += _scan(order, weights, volumes, free_weight, free_volume)[0]
+            break
+
+        # Every parcel tied with the cutoff cost goes in the head, and `remaining` stays in index order, so
+        # ties are broken by index exactly as in a stable sort of all the parcels.
+        remaining_costs = costs[remaining]
+        in_head = remaining_costs <= np.partition(remaining_costs, head_size)[head_size]
+        head = remaining[in_head]
+        head = head[np.argsort(costs[head], kind="stable")]
+        head_accepted, free_weight, free_volume = _scan(head, weights, volumes, free_weight, free_volume)
+        accepted += head_accepted
+
+        remaining = remaining[~in_head]
+        remaining = remaining[(weights[remaining] <= free_weight) & (volumes[remaining] <= free_volume)]
+        head_size *= 4
+
+    if not accepted:
+        return np.empty(0, dtype=np.intp)
+    return np.concatenate(accepted)
+
+
+def plan_fleet(
+        weights: np.ndarray,
+        volumes: np.ndarray,
+        destination_codes: np.ndarray,
+        trains: list,
+        deadline: float = None,
+):
+    """
+    Pack the parcel backlog into a whole fleet in one pass.
+
+    Trains are filled one after another, cheapest first, each with `greedy_fill` over the still-unassigned
+    parcels whose destination is one of its lines. Parcels are bucketed by destination up front so a train
+    only ever scans the buckets of its own lines.
+
+    Parameters:
+    - weights (np.ndarray): Parcel weights.
+    - volumes (np.ndarray): Parcel volumes, aligned with `weights`.
+    - destination_codes (np.ndarray): Integer destination code of every parcel.
+    - trains (list): One dict per train with `weight_cost_factor`, `volume_cost_factor`, `free_weight`,
+      `free_volume` and `line_codes` (destination codes the train serves).
+    - deadline (float): Optional `time.perf_counter()` value after which no further trains are filled.
+
+    Returns:
+    - tuple: `(assignments, truncated)` where `assignments[i]` holds the parcel indices given to `trains[i]`
+      and `truncated` tells whether the deadline stopped the pass early.
+    """
+    by_destination = np.argsort(destination_codes, kind="stable")
+    codes, starts = np.unique(destination_codes[by_destination], return_index=True)
+    pending = dict(zip(codes.tolist(), np.split(by_destination, starts[1:])))
+    assigned = np.zeros(weights.size, dtype=bool)
+
+    mean_weight = float(weights.mean()) if weights.size else 0.0
+    mean_volume = float(volumes.mean()) if volumes.size else 0.0
+    train_order = sorted(
+        range(len(trains)),
+        key=lambda i: trains[i]["weight_cost_factor"] * mean_weight + trains[i]["volume_cost_factor"] * mean_volume,
+    )
+
+    assignments = [np.empty(0, dtype=np.intp) for _ in trains]
+    truncated = False
+    for train_index in train_order:
+        if deadline is not None and time.perf_counter() > deadline:
+            truncated = True
+            break
+
+        train = trains[train_index]
+        lines = [code for code in set(train["line_codes"]) if code in pending and pending[code].size]
+        if not lines:
+            continue
+        candidates = np.concatenate([pending[code] for code in lines])
+
+        costs = shipping_costs(
+            weights[candidates], volumes[candidates], train["weight_cost_factor"], train["volume_cost_factor"]
+        )
+        accepted = candidates[
+            greedy_fill(weights[candidates], volumes[candidates], costs, train["free_weight"], train["free_volume"])
+        ]
+        if not accepted.size:
+            continue
+
+        assignments[train_index] = accepted
+        assigned[accepted] = True
+        for code in lines:
+            pending[code] = pending[code][~assigned[pending[code]]]
+
+    return assignments, truncated
+
+
+def cheapest_trains(
+        weights: np.ndarray,
+        volumes: np.ndarray,
+        destination_codes: np.ndarray,
+        weight_cost_factors: np.ndarray,
+        volume_cost_factors: np.ndarray,
+        line_matrix: np.ndarray,
+        chunk_cells: int = 4_000_000,
+):
+    """
+    Quote many parcels against many trains at once.
+
+    The parcel-by-train cost matrix is evaluated in row chunks of about `chunk_cells` cells, masked by line
+    compatibility, and reduced to the cheapest train of every parcel.
+
+    Parameters:
+    - weights (np.ndarray): Parcel weights.
+    - volumes (np.ndarray): Parcel volumes, aligned with `weights`.
+    - destination_codes (np.ndarray): Integer destination code of every parcel.
+    - weight_cost_factors (np.ndarray): Cost per unit of weight of every train.
+    - volume_cost_factors (np.ndarray): Cost per unit of volume of every train.
+    - line_matrix (np.ndarray): Boolean `(destinations, trains)` matrix, true where a train serves a destination.
+    - chunk_cells (int): Upper bound on the size of the cost matrix held in memory at once.
+
+    Returns:
+    - tuple: `(train_indices, costs)`; parcels no train can ship get index -1 and cost `inf`.
+    """
+    train_indices = np.full(weights.size, -1, dtype=np.intp)
+    costs = np.full(weights.size, np.inf)
+    if not weight_cost_factors.size:
+        return train_indices, costs
+
+    rows = max(1, chunk_cells // weight_cost_factors.size)
+    for start in range(0, weights.size, rows):
+        chunk = slice(start, start + rows)
+        matrix = np.multiply.outer(weights[chunk], weight_cost_factors)
+        matrix += np.multiply.outer(volumes[chunk], volume_cost_factors)
+        matrix[~line_matrix[destination_codes[chunk]]] = np.inf
+
+        best = matrix.argmin(axis=1)
+        best_costs = matrix[np.arange(best.size), best]
+        reachable = np.isfinite(best_costs)
+        train_indices[chunk] = np.where(reachable, best, -1)
+        costs[chunk] = best_costs
+
+    return train_indices, costs
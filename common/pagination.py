@@ -0,0 +1,118 @@
+import base64
+import binascii
+from datetime import datetime
+
+import orjson
+from fastapi import HTTPException, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from database.db import SessionLocal
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), row_id
+    except (binascii.Error, UnicodeDecodeError, ValueError) as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor") from err
+
+
+def keyset(query, model, limit: int = None, after: str = None):
+    """
+    Order a select by `(created_at, id)` and restrict it to the rows following the `after` cursor.
+    """
+    query = query.order_by(model.created_at, model.id)
+    if after:
+        query = query.where(tuple_(model.created_at, model.id) > tuple_(*decode_cursor(after)))
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+async def paginate(db: Session, query, model, response: Response, limit: int = None, after: str = None):
+    """
+    Fetch one keyset page of ORM objects, advertising the cursor of the next page in the X-Next-Cursor header.
+    """
+    result = await db.execute(keyset(query, model, limit + 1 if limit else None, after))  # noqa
+    rows = result.scalars().all()
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows
+
+
+def schema_columns(query, model, schema):
+    """
+    Narrow a select of `model` entities to the columns named by the fields of `schema`, in field order.
+    """
+    return query.with_only_columns(*(getattr(model, name) for name in schema.model_fields))
+
+
+async def paginate_rows(db: Session, query, model, schema, response: Response, limit: int = None, after: str = None):
+    """
+    Fast counterpart of `paginate`: fetch one keyset page as plain dicts built from the `schema` columns,
+    without loading ORM objects. The database rows are trusted, so they are not validated against `schema`.
+    """
+    query = keyset(schema_columns(query, model, schema), model, limit + 1 if limit else None, after)
+    result = await db.execute(query)  # noqa
+    rows = result.all()
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    names = list(schema.model_fields)
+    return [dict(zip(names, row)) for row in rows]
+
+
+def json_rows(rows: list, response: Response) -> ORJSONResponse:
+    """
+    Encode rows from `paginate_rows` with orjson, carrying over the X-Next-Cursor header.
+    """
+    cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    return ORJSONResponse(rows, headers={NEXT_CURSOR_HEADER: cursor} if cursor else None)
+
+
+def stream_rows(query, schema, batch_size: int = 1_000) -> StreamingResponse:
+    """
+    Stream the rows of a select as a JSON array through a server-side cursor, one row at a time.
+
+    The body runs after the handler has returned, so it reads through its own session rather than the
+    request's.
+    """
+    async def body():
+        async with SessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=batch_size))  # noqa
+            separator = b"["
+            async for row in result.scalars():
+                yield separator + schema.model_validate(row, from_attributes=True).model_dump_json().encode()
+                separator = b","
+            yield b"[]" if separator == b"[" else b"]"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+def stream_json_rows(query, model, schema, batch_size: int = 1_000) -> StreamingResponse:
+    """
+    Fast counterpart of `stream_rows`: select only the `schema` columns and encode every fetched batch at
+    once with orjson, without validating the rows against `schema`.
+    """
+    async def body():
+        names = list(schema.model_fields)
+        query_columns = schema_columns(query, model, schema).execution_options(yield_per=batch_size)
+        async with SessionLocal() as db:
+            result = await db.stream(query_columns)  # noqa
+            separator = b"["
+            async for rows in result.partitions():
+                # Each batch is encoded as an array whose brackets are replaced by the running separators.
+                yield separator + orjson.dumps([dict(zip(names, row)) for row in rows])[1:-1]
+                separator = b","
+            yield b"[]" if separator == b"[" else b"]"
+
+    return StreamingResponse(body(), media_type="application/json")
@@ -0,0 +1,222 @@
+import asyncio
+from collections import OrderedDict, defaultdict
+
+from config.config import settings
+
+
+class _Label:
+    """
+    One multi-leg path: its summed cost factors, the line it ends on and, through `previous`, the legs that
+    led there.
+    """
+    __slots__ = ("weight_factor", "volume_factor", "line", "train_id", "leg_weight_factor",
+                 "leg_volume_factor", "previous")
+
+    def __init__(self, weight_factor, volume_factor, line, train_id=None, leg_weight_factor=0.0,
+                 leg_volume_factor=0.0, previous=None):
+        self.weight_factor = weight_factor
+        self.volume_factor = volume_factor
+        self.line = line
+        self.train_id = train_id
+        self.leg_weight_factor = leg_weight_factor
+        self.leg_volume_factor = leg_volume_factor
+        self.previous = previous
+
+    def cost(self, weight: float, volume: float) -> float:
+        return weight * self.weight_factor + volume * self.volume_factor
+
+    def legs(self):
+        legs, label = [], self
+        while label.train_id is not None:
+            legs.append(label)
+            label = label.previous
+        return legs[::-1]
+
+
+def lower_hull(labels: list) -> list:
+    """
+    Keep the labels that are cheapest for at least one parcel.
+
+    A path costs `weight * weight_factor + volume * volume_factor`, so for positive weights and volumes the
+    cheapest path is always a vertex of the lower-left convex hull of the `(weight_factor, volume_factor)`
+    points. The hull is returned sorted by increasing weight factor (and so decreasing volume factor).
+    """
+    hull = []
+    for label in sorted(labels, key=lambda item: (item.weight_factor, item.volume_factor)):
+        if hull and label.volume_factor >= hull[-1].volume_factor:
+            continue
+        while len(hull) >= 2:
+            first, middle = hull[-2], hull[-1]
+            turn = (
+                (middle.weight_factor - first.weight_factor) * (label.volume_factor - first.volume_factor)
+                - (middle.volume_factor - first.volume_factor) * (label.weight_factor - first.weight_factor)
+            )
+            if turn > 0:
+                break
+            hull.pop()
+        hull.append(label)
+    return hull
+
+
+def cheapest_on_hull(hull: list, weight: float, volume: float):
+    """
+    Binary search for the hull vertex with the lowest cost: along the hull the cost is convex.
+    """
+    low, high = 0, len(hull) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if hull[middle + 1].cost(weight, volume) < hull[middle].cost(weight, volume):
+            low = middle + 1
+        else:
+            high = middle
+    return hull[low]
+
+
+class RouteTables:
+    """
+    Cheapest multi-leg routes over the available fleet.
+
+    Lines are the nodes of the graph and every train links all the lines it serves, so a line served by
+    several trains is an interchange. A route boards a train at the parcel's origin, changes trains at
+    interchanges and ends on its destination, with at most `max_legs` legs.
+
+    For each origin the table holds, per reachable line, the lower hull of the route cost factors
+    (see `lower_hull`). Tables are computed in a worker thread on the first quote from an origin, and the
+    `max_origins` most recently used ones are kept. A quote is then a binary search over one hull.
+    `refresh` diffs a new fleet snapshot against the previous one and only drops the tables from which an
+    offered, withdrawn or changed train could be boarded.
+
+    An origin of None means the parcel can board any train, as for single-train quotes. Changing trains
+    then never pays off (the last train could have been boarded directly), so those quotes use the hull
+    of the trains serving the destination, and a fleet change only drops the hulls of the lines it touches.
+    """
+
+    def __init__(self, max_legs: int, max_origins: int):
+        self.max_legs = max_legs
+        self.max_origins = max_origins
+        self._version = None
+        self._fleet = {}
+        self._boarding = defaultdict(list)
+        self._tables = OrderedDict()
+        self._direct = {}
+
+    def refresh(self, snapshot):
+        if snapshot.version and snapshot.version == self._version:
+            return
+        fleet = {
+            snapshot.train_id(index): (float(weight_factor), float(volume_factor), tuple(lines))
+            for index, (weight_factor, volume_factor, lines) in enumerate(
+                zip(snapshot.weight_cost_factors.tolist(), snapshot.volume_cost_factors.tolist(),
+                    snapshot.train_lines())
+            )
+        }
+        changed = set()
+        for train_id in fleet.keys() | self._fleet.keys():
+            if fleet.get(train_id) != self._fleet.get(train_id):
+                for entry in (fleet.get(train_id), self._fleet.get(train_id)):
+                    changed.update(entry[2] if entry else ())
+
+        if changed:
+            self._fleet = fleet
+            self._boarding = defaultdict(list)
+            for train_id, (_, _, lines) in fleet.items():
+                for line in lines:
+                    self._boarding[line].append(train_id)
+            # A new train only matters to origins that can already reach one of its lines, so the
+            # boarding sets computed on the previous fleet are enough to find the stale tables.
+            self._tables = OrderedDict(
+                (origin, table) for origin, table in self._tables.items() if not table[1] & changed
+            )
+            self._direct = {line: hull for line, hull in self._direct.items() if line not in changed}
+        self._version = snapshot.version
+
+    def _build(self, origin, fleet: dict, boarding: dict):
+        labels = {origin: [_Label(0.0, 0.0, origin)]}
+        frontier = {origin}
+        boardable = {origin}
+
+        for leg in range(self.max_legs):
+            candidates = defaultdict(list)
+            for train_id in {train_id for line in frontier for train_id in boarding.get(line, ())}:
+                weight_factor, volume_factor, lines = fleet[train_id]
+                entries = lower_hull([label for line in lines for label in labels.get(line, ())])
+                for line in lines:
+                    candidates[line].extend(
+                        _Label(
+                            entry.weight_factor + weight_factor,
+                            entry.volume_factor + volume_factor,
+                            line,
+                            train_id,
+                            weight_factor,
+                            volume_factor,
+                            entry,
+                        )
+                        for entry in entries if entry.line != line
+                    )
+
+            frontier = set()
+            for line, arrivals in candidates.items():
+                hull = lower_hull(labels.get(line, []) + arrivals)
+                if hull != labels.get(line):
+                    labels[line] = hull
+                    frontier.add(line)
+            if leg < self.max_legs - 1:
+                boardable |= frontier
+            if not frontier:
+                break
+
+        return labels, boardable
+
+    async def _table(self, origin):
+        table = self._tables.get(origin)
+        if table is not None:
+            self._tables.move_to_end(origin)
+            return table
+        fleet, boarding = self._fleet, self._boarding
+        table = await asyncio.get_running_loop().run_in_executor(None, self._build, origin, fleet, boarding)
+        # A table built while the fleet changed is still returned, but not kept.
+        if fleet is self._fleet:
+            self._tables[origin] = table
+            if len(self._tables) > self.max_origins:
+                self._tables.popitem(last=False)
+        return table
+
+    def _direct_hull(self, destination: str) -> list:
+        hull = self._direct.get(destination)
+        if hull is None:
+            root = _Label(0.0, 0.0, None)
+            labels = []
+            for train_id in self._boarding.get(destination, ()):
+                weight_factor, volume_factor, _ = self._fleet[train_id]
+                labels.append(
+                    _Label(weight_factor, volume_factor, destination, train_id, weight_factor, volume_factor, root)
+                )
+            hull = self._direct[destination] = lower_hull(labels)
+        return hull
+
+    async def quote(self, origin, destination: str, weight: float, volume: float):
+        """
+        Returns:
+        - tuple: `(total_cost, legs)` of the cheapest route with at most `max_legs` legs, where each leg is a
+          dict with `train_id`, `from_line`, `to_line` and `cost`, or None when no route exists.
+        """
+        if origin is None:
+            hull = self._direct_hull(destination)
+        else:
+            hull = (await self._table(origin))[0].get(destination)
+        if not hull:
+            return None
+        best = cheapest_on_hull(hull, weight, volume)
+        legs = [
+            {
+                "train_id": label.train_id,
+                "from_line": label.previous.line,
+                "to_line": label.line,
+                "cost": weight * label.leg_weight_factor + volume * label.leg_volume_factor,
+            }
+            for label in best.legs()
+        ]
+        return best.cost(weight, volume), legs
+
+
+route_tables = RouteTables(settings.MAX_ROUTE_LEGS, settings.MAX_ROUTE_ORIGINS)
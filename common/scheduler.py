@@ -0,0 +1,246 @@
+import asyncio
+import heapq
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from common.cache import train_cache
+from common.enums import TrainStatus
+from common.events import listener, publish
+from common.fleet import FLEET_CHANNEL
+from common.helpers import any_of
+from config.config import settings
+from database.db import SessionLocal
+from models.backlog import DestinationBacklog
+from models.parcel import Parcel
+from models.train import Train
+
+logger = logging.getLogger(__name__)
+
+# Serializes scheduling passes across processes and hosts, so two passes never hand out the same slot.
+SCHEDULE_LOCK_KEY = 0x5CED
+
+
+def choose_line(lines, cargo: dict, pending: dict, next_slot: dict, earliest: datetime):
+    """
+    Pick the line among `lines` to which the train carries the most weight (`cargo`), then the one with the
+    heaviest pending backlog, then the one with the earliest free slot. Lines the train carries nothing to
+    are only considered when it carries nothing to any of its lines.
+    """
+    candidates = [line for line in lines if cargo.get(line)] or lines
+    return min(
+        candidates,
+        key=lambda line: (-cargo.get(line, 0.0), -pending.get(line, 0.0), next_slot.get(line, earliest), line),
+    )
+
+
+class DepartureScheduler:
+    """
+    Assigns every booked train a line and a departure slot, and sends trains when their slot comes up.
+
+    A scheduling pass gives each booked train without a slot the line it serves that most of its own cargo
+    is bound for (ties go to the heaviest pending backlog), then the first slot on that line at least
+    `headway` after the previous departure, booked or already sent, and `lead` from now. The train's weight
+    is taken off that line's backlog for the rest of the pass, so a burst of bookings spreads over the busy
+    lines instead of queueing on one.
+
+    Due departures are kept in a heap of `(departure_time, train_id)`, so scheduling and popping a train are
+    O(log n). Trains are sent in batches of up to `batch_size`: one statement moves them to SENT and one
+    marks their parcels shipped. Every process runs the loop; the SENT transition only applies to trains
+    still BOOKED, so a train queued in several processes departs once. The heap is reloaded from the
+    database every `poll_interval` seconds to pick up trains scheduled elsewhere.
+    """
+
+    def __init__(self, headway: float, lead: float, batch_size: int, poll_interval: float, enabled: bool = True):
+        self.enabled = enabled
+        self.headway = timedelta(seconds=headway)
+        self.lead = timedelta(seconds=lead)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._queue = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def notify(self, payload=None):
+        self._wakeup.set()
+
+    def start(self):
+        if self.enabled:
+            listener.subscribe(FLEET_CHANNEL, self.notify)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        listener.unsubscribe(FLEET_CHANNEL, self.notify)
+
+    async def reload(self):
+        async with SessionLocal() as db:
+            scheduled = await db.execute(  # noqa
+                select(Train.departure_time, Train.id).where(
+                    Train.status == TrainStatus.BOOKED, Train.departure_time.is_not(None)
+                )
+            )
+            self._queue = [tuple(row) for row in scheduled.all()]
+        heapq.heapify(self._queue)
+
+    async def schedule(self):
+        """
+        Give every booked train without a departure slot a line and a slot.
+
+        Returns:
+        - list: `(train_id, assigned_line, departure_time)` of the trains scheduled by this pass.
+        """
+        async with SessionLocal() as db:
+            await db.execute(select(func.pg_advisory_xact_lock(SCHEDULE_LOCK_KEY)))  # noqa
+            trains = await db.execute(  # noqa
+                select(Train.id, Train.lines, Train.current_weight)
+                .where(Train.status == TrainStatus.BOOKED, Train.departure_time.is_(None))
+                .order_by(Train.updated_at, Train.id)
+                .with_for_update(skip_locked=True)
+            )
+            trains = trains.all()
+            if not trains:
+                return []
+
+            lines = sorted({line for train in trains for line in train.lines})
+            pending = await db.execute(  # noqa
+                select(DestinationBacklog.destination, DestinationBacklog.pending_weight)
+                .where(any_of(DestinationBacklog.destination, lines))
+            )
+            pending = dict(pending.all())
+            cargo = await db.execute(  # noqa
+                select(Parcel.train_id, Parcel.destination, func.sum(Parcel.weight))
+                .where(any_of(Parcel.train_id, [train.id for train in trains]))
+                .group_by(Parcel.train_id, Parcel.destination)
+            )
+            cargo_of = defaultdict(dict)
+            for train_id, destination, weight in cargo.all():
+                cargo_of[train_id][destination] = weight
+            # Trains that left less than a headway ago still hold their line.
+            now = datetime.now()
+            next_slot = await db.execute(  # noqa
+                select(Train.assigned_line, func.max(Train.departure_time))
+                .where(
+                    Train.status.in_([TrainStatus.BOOKED, TrainStatus.SENT]),
+                    Train.departure_time > now - self.headway,
+                    any_of(Train.assigned_line, lines),
+                )
+                .group_by(Train.assigned_line)
+            )
+            next_slot = {line: departure_time + self.headway for line, departure_time in next_slot.all()}
+
+            earliest = now + self.lead
+            scheduled = []
+            for train in trains:
+                if not train.lines:
+                    continue
+                line = choose_line(train.lines, cargo_of[train.id], pending, next_slot, earliest)
+                departure_time = max(earliest, next_slot.get(line, earliest))
+                next_slot[line] = departure_time + self.headway
+                pending[line] = pending.get(line, 0.0) - train.current_weight
+                scheduled.append((train.id, line, departure_time))
+            if scheduled:
+                now = datetime.now()
+                await db.execute(  # noqa
+                    update(Train),
+                    [
+                        {"id": train_id, "assigned_line": line, "departure_time": departure_time, "updated_at": now}
+                        for train_id, line, departure_time in scheduled
+                    ],
+                )
+                await publish(db, "train", [
+                    {
+                        "id": train_id,
+                        "assigned_line": line,
+                        "departure_time": departure_time.strftime("%Y-%m-%d %H:%M:%S"),
+                    }
+                    for train_id, line, departure_time in scheduled
+                ])
+            await db.commit()  # noqa
+
+        for train_id, _, departure_time in scheduled:
+            heapq.heappush(self._queue, (departure_time, train_id))
+        train_cache.invalidate(*(train_id for train_id, _, _ in scheduled))
+        return scheduled
+
+    def due(self, now: datetime) -> list:
+        """
+        Pop up to `batch_size` trains whose departure time has come.
+        """
+        batch = []
+        while self._queue and self._queue[0][0] <= now and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(self._queue)[1])
+        return batch
+
+    @staticmethod
+    async def depart(train_ids: list) -> list:
+        """
+        Send the given trains that are still BOOKED and mark their parcels shipped.
+
+        Returns:
+        - list: IDs of the trains that departed.
+        """
+        async with SessionLocal() as db:
+            departed = await db.execute(  # noqa
+                update(Train)
+                .where(any_of(Train.id, train_ids), Train.status == TrainStatus.BOOKED)
+                .values(status=TrainStatus.SENT, updated_at=datetime.now())
+                .returning(Train.id)
+                .execution_options(synchronize_session=False)
+            )
+            departed = departed.scalars().all()
+            if departed:
+                shipped = await db.execute(  # noqa
+                    update(Parcel)
+                    .where(any_of(Parcel.train_id, departed))
+                    .values(has_shipped=True, updated_at=datetime.now())
+                    .returning(Parcel.id)
+                    .execution_options(synchronize_session=False)
+                )
+                await publish(db, "train", [{"id": train_id, "status": TrainStatus.SENT} for train_id in departed])
+                await publish(db, "parcel", [{"id": parcel_id, "has_shipped": True} for parcel_id in shipped.scalars()])
+            await db.commit()  # noqa
+        train_cache.invalidate(*departed)
+        return departed
+
+    async def _run(self):
+        reloaded_at = None
+        while True:
+            self._wakeup.clear()
+            try:
+                now = datetime.now()
+                if reloaded_at is None or (now - reloaded_at).total_seconds() >= self.poll_interval:
+                    await self.reload()
+                    reloaded_at = now
+                await self.schedule()
+                while batch := self.due(datetime.now()):
+                    await self.depart(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa
+                logger.exception("Departure scheduler pass failed")
+
+            timeout = self.poll_interval
+            if self._queue:
+                timeout = min(timeout, max(0.0, (self._queue[0][0] - datetime.now()).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+departure_scheduler = DepartureScheduler(
+    settings.SCHEDULER_HEADWAY_SECONDS,
+    settings.SCHEDULER_LEAD_SECONDS,
+    settings.SCHEDULER_BATCH_SIZE,
+    settings.SCHEDULER_POLL_SECONDS,
+    settings.SCHEDULER_ENABLED,
+)
@@ -0,0 +1,144 @@
+import asyncio
+import json
+from collections import defaultdict
+
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from common.events import STATUS_CHANNEL, listener
+from config.config import settings
+
+
+class Subscription:
+    """
+    The parcels or trains one client follows, and the `(id, encoded event)` pairs waiting to be sent to it.
+
+    `None` in the queue ends the stream: the client reconnects and starts again from a fresh snapshot.
+    """
+
+    def __init__(self, kind: str, ids, queue_size: int):
+        self.kind = kind
+        self.ids = frozenset(ids)
+        self.queue = asyncio.Queue(queue_size)
+        self.active = True
+
+    def push(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # The client fell behind: drop what it has not read and make it reconnect for a fresh snapshot.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class StatusHub:
+    """
+    In-process fan-out of parcel and train status events to the subscriptions of this worker.
+
+    Events reach every worker through the `status_changed` Postgres channel (see `common.events.publish`)
+    and are encoded once, however many clients follow the object. An idle subscription is one queue and
+    one entry per followed id, and holds no database connection.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions = defaultdict(set)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def start(self):
+        listener.subscribe(STATUS_CHANNEL, self.dispatch)
+
+    def stop(self):
+        listener.unsubscribe(STATUS_CHANNEL, self.dispatch)
+
+    def subscribe(self, kind: str, ids) -> Subscription:
+        subscription = Subscription(kind, ids, self.queue_size)
+        for object_id in subscription.ids:
+            self._subscriptions[kind, object_id].add(subscription)
+        self._count += 1
+        return subscription
+
+    def _forget(self, subscription: Subscription, ids):
+        for object_id in ids:
+            followers = self._subscriptions.get((subscription.kind, object_id))
+            if followers is not None:
+                followers.discard(subscription)
+                if not followers:
+                    del self._subscriptions[subscription.kind, object_id]
+
+    def restrict(self, subscription: Subscription, ids):
+        ids = subscription.ids & frozenset(ids)
+        self._forget(subscription, subscription.ids - ids)
+        subscription.ids = ids
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription.active:
+            subscription.active = False
+            self._forget(subscription, subscription.ids)
+            self._count -= 1
+
+    def dispatch(self, payload):
+        if payload is None:
+            # Notifications sent while the listener was reconnecting are lost, so every client resyncs.
+            for subscription in {item for followers in self._subscriptions.values() for item in followers}:
+                subscription.push(None)
+            return
+        message = json.loads(payload)
+        for event in message["events"]:
+            followers = self._subscriptions.get((message["kind"], event["id"]))
+            if followers:
+                item = (event["id"], json.dumps(event))
+                for subscription in followers:
+                    subscription.push(item)
+
+    async def open(self, kind: str, ids, load_snapshot):
+        """
+        Follow `ids` and return a Server-Sent Events response, or None when the client may follow none of them.
+
+        `load_snapshot` is awaited once the subscription is registered, so no change committed meanwhile is
+        missed. It returns the current state of the objects the client may follow, as dicts with an `id`;
+        only those stay followed. The response sends that snapshot, then every change, with a comment line
+        every SSE_HEARTBEAT_SECONDS so proxies keep the connection open.
+        """
+        subscription = self.subscribe(kind, ids)
+        try:
+            snapshot = await load_snapshot()
+        except BaseException:
+            self.unsubscribe(subscription)
+            raise
+        self.restrict(subscription, [event["id"] for event in snapshot])
+        if not snapshot:
+            self.unsubscribe(subscription)
+            return None
+
+        async def body():
+            yield f"retry: {settings.SSE_RETRY_MILLISECONDS}\n\n"
+            for event in snapshot:
+                yield f"event: {kind}\ndata: {json.dumps(event, default=str)}\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    return
+                # Events queued before the subscription was restricted may concern objects the client
+                # is not allowed to follow.
+                if item[0] in subscription.ids:
+                    yield f"event: {kind}\ndata: {item[1]}\n\n"
+
+        # The background task runs once the response ends, including when the client disconnects first.
+        return StreamingResponse(
+            body(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(self.unsubscribe, subscription),
+        )
+
+
+status_hub = StatusHub(settings.SSE_QUEUE_SIZE)
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jwt import encode
+
+from common import authentication
+from common.authentication import VerifiedTokenCache, decode_jwt
+from config.config import settings
+
+
+def make_token(exp: float, user_id: str = "user-1") -> str:
+    return encode({"exp": int(exp), "user_id": user_id}, key=settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def credentials(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def rejection(token: str) -> HTTPException:
+    with pytest.raises(HTTPException) as raised:
+        decode_jwt(credentials(token))
+    return raised.value
+
+
+@pytest.fixture
+def token_cache(monkeypatch):
+    cache = VerifiedTokenCache(max_size=2)
+    monkeypatch.setattr(authentication, "token_cache", cache)
+    return cache
+
+
+def test_entry_is_not_returned_from_its_exp(monkeypatch):
+    cache = VerifiedTokenCache(max_size=10)
+    now = time.time()
+    cache.put("token", {"exp": now + 60, "user_id": "user-1"})
+    assert cache.get("token") == {"exp": now + 60, "user_id": "user-1"}
+
+    monkeypatch.setattr(authentication.time, "time", lambda: now + 60)
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_tokens_without_exp_are_not_cached():
+    cache = VerifiedTokenCache(max_size=10)
+    cache.put("token", {"user_id": "user-1"})
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_at_capacity():
+    cache = VerifiedTokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put("first", {"exp": exp})
+    cache.put("second", {"exp": exp})
+    assert cache.get("first") is not None
+    cache.put("third", {"exp": exp})
+    assert cache.stats()["size"] == 2
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+
+
+def test_hits_and_misses_are_counted(token_cache):
+    token = make_token(time.time() + 60)
+    assert decode_jwt(credentials(token))["user_id"] == "user-1"
+    assert token_cache.stats() == {"hits": 0, "misses": 1, "size": 1}
+    assert decode_jwt(credentials(token))["user_id"] == "user-1"
+    assert token_cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_cached_and_uncached_expired_tokens_are_rejected_alike(token_cache):
+    token = make_token(time.time() - 60)
+    uncached = rejection(token)
+
+    # As if the token had been verified and cached while it was still valid.
+    token_cache.put(token, {"exp": int(time.time()) - 60, "user_id": "user-1"})
+    cached = rejection(token)
+
+    assert uncached.status_code == cached.status_code == 401
+    assert uncached.detail == cached.detail
+    assert uncached.headers == cached.headers == {"WWW-Authenticate": 'Bearer error="invalid_token"'}
+
+
+def test_tampered_token_is_rejected_alike_whether_or_not_the_original_is_cached(token_cache):
+    token = make_token(time.time() + 60)
+    tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+    uncached = rejection(tampered)
+
+    decode_jwt(credentials(token))
+    cached = rejection(tampered)
+
+    assert uncached.status_code == cached.status_code == 401
+    assert uncached.detail == cached.detail
+    assert uncached.headers == cached.headers == {"WWW-Authenticate": 'Bearer error="invalid_token"'}
@@ -0,0 +1,31 @@
+from common.cache import LocalCacheBackend, TrainCache
+from common.events import notification_payloads
+
+
+def make_cache():
+    cache = TrainCache(LocalCacheBackend(max_size=100), ttl=60.0)
+    for train_id in ("train-1", "train-2"):
+        for view in TrainCache.VIEWS:
+            cache.set(train_id, view, {"train_id": train_id, "view": view})
+    return cache
+
+
+def test_train_events_from_other_workers_invalidate_the_train():
+    cache = make_cache()
+    for payload in notification_payloads("train", [{"id": "train-1", "status": "BOOKED"}]):
+        cache.on_status_changed(payload)
+    assert all(cache.get("train-1", view) is None for view in TrainCache.VIEWS)
+    assert all(cache.get("train-2", view) is not None for view in TrainCache.VIEWS)
+
+
+def test_parcel_events_leave_the_cache_alone():
+    cache = make_cache()
+    for payload in notification_payloads("parcel", [{"id": "train-1", "has_shipped": True}]):
+        cache.on_status_changed(payload)
+    assert cache.get("train-1", "status") is not None
+
+
+def test_listener_reconnect_clears_the_cache():
+    cache = make_cache()
+    cache.on_status_changed(None)
+    assert all(cache.get(train_id, view) is None for train_id in ("train-1", "train-2") for view in TrainCache.VIEWS)
@@ -0,0 +1,34 @@
+from common.fleet import FleetSnapshot
+
+TRAINS = [
+    ("train-1", 1.0, 2.0, 10.0, 20.0, ["Zürich", "line-1"]),
+    ("träin-2", 0.5, 0.5, 5.0, 5.0, ["Zürich"]),
+    ("train-3", 3.0, 1.0, 1.0, 1.0, ["東京"]),
+]
+
+
+def check_snapshot(snapshot: FleetSnapshot):
+    assert [snapshot.train_id(index) for index in range(len(snapshot))] == ["train-1", "träin-2", "train-3"]
+    assert [sorted(lines) for lines in snapshot.train_lines()] == [["Zürich", "line-1"], ["Zürich"], ["東京"]]
+    assert snapshot.serves("Zürich").tolist() == [True, True, False]
+    assert snapshot.cheapest(1.0, 1.0, "Zürich") == ("träin-2", 1.0)
+    assert snapshot.cheapest(1.0, 1.0, "東京") == ("train-3", 4.0)
+    assert snapshot.cheapest(1.0, 1.0, "Zurich") is None
+
+
+def test_build_handles_non_ascii_ids_and_lines():
+    check_snapshot(FleetSnapshot.build(TRAINS, version=1))
+
+
+def test_written_snapshot_maps_back_non_ascii_ids_and_lines(tmp_path):
+    path = str(tmp_path / "fleet.snapshot")
+    FleetSnapshot.build(TRAINS, version=3).write(path)
+    snapshot = FleetSnapshot.open(path)
+    assert snapshot.version == 3
+    check_snapshot(snapshot)
+
+
+def test_build_handles_an_empty_fleet():
+    snapshot = FleetSnapshot.build([], version=1)
+    assert len(snapshot) == 0
+    assert snapshot.cheapest(1.0, 1.0, "Zürich") is None
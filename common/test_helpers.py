@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from common.helpers import copy_parcels
+
+
+class FakeSession:
+    """
+    Stands in for the AsyncSession: records the statements, the COPY and the commit in the order they run.
+    """
+
+    def __init__(self, fail_statements: bool = False):
+        self.fail_statements = fail_statements
+        self.calls = []
+        self.copied = []
+
+    async def execute(self, statement):
+        if self.fail_statements:
+            raise RuntimeError("backlog update failed")
+        self.calls.append("execute")
+
+    async def connection(self):
+        return self
+
+    async def get_raw_connection(self):
+        return self
+
+    @property
+    def driver_connection(self):
+        return self
+
+    async def copy_records_to_table(self, table_name, records, columns):
+        self.calls.append("copy")
+        self.copied += records
+
+    async def commit(self):
+        self.calls.append("commit")
+
+
+def parcel_records(count: int) -> list:
+    now = datetime.now()
+    return [
+        (f"parcel-{index}", now, now, True, "owner-1", 1.0, 2.0, f"line-{index % 2}", None, False)
+        for index in range(count)
+    ]
+
+
+def test_copy_runs_after_the_backlog_update_in_the_same_transaction():
+    db = FakeSession()
+    asyncio.run(copy_parcels(db, parcel_records(3)))
+    # The backlog statement opens the transaction; the COPY and the commit follow on the same connection.
+    assert db.calls == ["execute", "copy", "commit"]
+    assert len(db.copied) == 3
+
+
+def test_failed_backlog_update_inserts_nothing():
+    db = FakeSession(fail_statements=True)
+    with pytest.raises(RuntimeError):
+        asyncio.run(copy_parcels(db, parcel_records(3)))
+    assert db.copied == []
+    assert "commit" not in db.calls
@@ -0,0 +1,66 @@
+import numpy as np
+
+from common.packing import greedy_fill, shipping_costs
+
+
+def sort_then_scan(weights, volumes, costs, free_weight, free_volume):
+    """
+    Baseline fill: sort every parcel by cost, then accept each one that still fits.
+    """
+    accepted = []
+    for index in np.argsort(costs, kind="stable").tolist():
+        if weights[index] <= free_weight and volumes[index] <= free_volume:
+            free_weight -= weights[index]
+            free_volume -= volumes[index]
+            accepted.append(index)
+    return np.asarray(accepted, dtype=np.intp)
+
+
+def random_backlog(rng: np.random.Generator, size: int):
+    # Multiples of 1/1024 keep every running total exact, so both fills see the same capacity left.
+    weights = rng.integers(1, 2 ** 20, size) / 1024
+    volumes = rng.integers(1, 2 ** 20, size) / 1024
+    return weights, volumes
+
+
+def check_fills(rng: np.random.Generator, size: int, costs_of):
+    weights, volumes = random_backlog(rng, size)
+    costs = costs_of(weights, volumes)
+    # From a train that takes a handful of parcels, through the partial-sort path, to one that takes them all.
+    share = rng.choice([0.0005, 0.01, 0.1, 0.5, 1.5])
+    free_weight, free_volume = float(weights.sum() * share), float(volumes.sum() * rng.uniform(0.5, 2.0) * share)
+    accepted = greedy_fill(weights, volumes, costs, free_weight, free_volume)
+    expected = sort_then_scan(weights, volumes, costs, free_weight, free_volume)
+    assert accepted.tolist() == expected.tolist(), (size, share)
+
+
+def test_greedy_fill_matches_sort_then_scan():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        size = int(rng.choice([rng.integers(1, 100), rng.integers(1_000, 10_000), rng.integers(20_000, 60_000)]))
+        weight_cost_factor, volume_cost_factor = rng.uniform(0.1, 5.0, 2)
+        check_fills(rng, size, lambda weights, volumes: shipping_costs(
+            weights, volumes, weight_cost_factor, volume_cost_factor
+        ))
+
+
+def test_greedy_fill_breaks_cost_ties_like_a_stable_sort():
+    rng = np.random.default_rng(2)
+    for _ in range(100):
+        size = int(rng.choice([rng.integers(1, 100), rng.integers(20_000, 60_000)]))
+        distinct_costs = int(rng.choice([1, 3, 50]))
+        check_fills(rng, size, lambda weights, volumes: rng.integers(0, distinct_costs, weights.size).astype(float))
+
+
+def test_greedy_fill_edge_cases():
+    empty = np.empty(0)
+    assert greedy_fill(empty, empty, empty, 10.0, 10.0).size == 0
+
+    weights = np.array([4.0, 1.0, 2.0])
+    volumes = np.array([1.0, 1.0, 1.0])
+    costs = np.array([1.0, 3.0, 2.0])
+    assert greedy_fill(weights, volumes, costs, 0.5, 10.0).tolist() == []
+    assert greedy_fill(weights, volumes, costs, 7.0, 3.0).tolist() == [0, 2, 1]
+    # The cheapest parcel does not fit, the next ones still do.
+    assert greedy_fill(weights, volumes, costs, 3.0, 3.0).tolist() == [2, 1]
+    assert greedy_fill(weights, volumes, costs, 7.0, 2.0).tolist() == [0, 2]
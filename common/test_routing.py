@@ -0,0 +1,93 @@
+import asyncio
+import heapq
+import itertools
+import random
+
+from common.fleet import FleetSnapshot
+from common.routing import RouteTables, _Label, lower_hull
+
+MAX_LEGS = 3
+
+
+def brute_force_route(trains: list, origin, destination: str, weight: float, volume: float, max_legs: int):
+    """
+    Cheapest route cost by Dijkstra over `(line, legs)` states, or None when the destination is unreachable.
+    """
+    if origin == destination:
+        return 0.0
+    best = {(origin, 0): 0.0}
+    heap = [(0.0, 0, origin)]
+    while heap:
+        cost, legs, line = heapq.heappop(heap)
+        if legs and line == destination:
+            return cost
+        if legs == max_legs or cost > best[line, legs]:
+            continue
+        for train_id, weight_factor, volume_factor, _, _, lines in trains:
+            if (origin is not None or legs) and line not in lines:
+                continue
+            for stop in lines:
+                arrival = cost + weight * weight_factor + volume * volume_factor
+                if stop != line and arrival < best.get((stop, legs + 1), float("inf")):
+                    best[stop, legs + 1] = arrival
+                    heapq.heappush(heap, (arrival, legs + 1, stop))
+    return None
+
+
+def random_train(rng: random.Random, lines: list, train_id: str) -> tuple:
+    return train_id, rng.uniform(0.5, 2.0), rng.uniform(0.5, 2.0), 0.0, 0.0, rng.sample(lines, rng.randint(1, 3))
+
+
+def check_quotes(tables: RouteTables, trains: list, lines: list, rng: random.Random, quotes: int = 200):
+    for _ in range(quotes):
+        origin, destination = rng.choice(lines + [None]), rng.choice(lines)
+        weight, volume = rng.uniform(0.1, 50.0), rng.uniform(0.1, 50.0)
+        route = asyncio.run(tables.quote(origin, destination, weight, volume))
+        expected = brute_force_route(trains, origin, destination, weight, volume, MAX_LEGS)
+        assert (route is None) == (expected is None), (origin, destination)
+        if route is not None:
+            total_cost, legs = route
+            assert abs(total_cost - expected) < 1e-9
+            assert abs(sum(leg["cost"] for leg in legs) - total_cost) < 1e-9
+            assert len(legs) <= MAX_LEGS
+            assert [leg["from_line"] for leg in legs[1:]] == [leg["to_line"] for leg in legs[:-1]]
+            if legs:
+                assert legs[0]["from_line"] == origin and legs[-1]["to_line"] == destination
+
+
+def test_lower_hull_keeps_every_cheapest_label():
+    rng = random.Random(7)
+    for _ in range(200):
+        labels = [_Label(rng.uniform(0.0, 10.0), rng.uniform(0.0, 10.0), "line") for _ in range(rng.randint(1, 30))]
+        hull = lower_hull(labels)
+        assert [label.weight_factor for label in hull] == sorted(label.weight_factor for label in hull)
+        for weight, volume in zip(
+            (rng.uniform(0.01, 100.0) for _ in range(50)), (rng.uniform(0.01, 100.0) for _ in range(50))
+        ):
+            cheapest = min(label.cost(weight, volume) for label in labels)
+            assert abs(min(label.cost(weight, volume) for label in hull) - cheapest) < 1e-9
+
+
+def test_quotes_match_brute_force_on_full_refresh():
+    rng = random.Random(1)
+    lines = [f"line-{index}" for index in range(30)]
+    trains = [random_train(rng, lines, f"train-{index}") for index in range(40)]
+    tables = RouteTables(MAX_LEGS, max_origins=8)
+    tables.refresh(FleetSnapshot.build(trains, version=1))
+    check_quotes(tables, trains, lines, rng)
+    assert len(tables._tables) <= 8
+
+
+def test_quotes_match_brute_force_after_incremental_refresh():
+    rng = random.Random(2)
+    lines = [f"line-{index}" for index in range(30)]
+    trains = [random_train(rng, lines, f"train-{index}") for index in range(40)]
+    tables = RouteTables(MAX_LEGS, max_origins=100)
+    new_ids = (f"train-new-{index}" for index in itertools.count())
+    for version in range(1, 7):
+        tables.refresh(FleetSnapshot.build(trains, version=version))
+        check_quotes(tables, trains, lines, rng)
+        # Withdraw three trains, offer three new ones and reprice one, keeping the tables built so far.
+        trains = trains[3:] + [random_train(rng, lines, next(new_ids)) for _ in range(3)]
+        train_id, _, _, free_weight, free_volume, train_lines = trains[0]
+        trains[0] = (train_id, rng.uniform(0.5, 2.0), rng.uniform(0.5, 2.0), free_weight, free_volume, train_lines)
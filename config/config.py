@@ -1,3 +1,6 @@
+from typing import Dict
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
@@ -7,10 +10,90 @@ class DevelopConfig(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    PLANNER_TIME_BUDGET_SECONDS: float = 10.0
+    MAX_QUOTE_BATCH_SIZE: int = 10_000
+    MAX_STATUS_BATCH_SIZE: int = 5_000
+    ASSIGNMENT_CLAIM_BATCH_SIZE: int = 5_000
+    ASSIGNMENT_REFILL_ROUNDS: int = 2
+    BOOKING_WORKERS: int = 2
+    BOOKING_JOB_POLL_SECONDS: float = 1.0
+    BOOKING_JOB_STALE_SECONDS: float = 300.0
+    BULK_INGEST_CHUNK_SIZE: int = 5_000
+    MAX_BULK_INGEST_ERRORS: int = 1_000
+    MAX_PAGE_SIZE: int = 1_000
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_DEPTH: int = 32
+    TOKEN_CACHE_SIZE: int = 10_000
+    REQUEST_METRICS_ENABLED: bool = True
+    QUERY_REPEAT_THRESHOLD: int = 10
+    TRAIN_CACHE_BACKEND: str = "common.cache.LocalCacheBackend"
+    TRAIN_CACHE_SIZE: int = 10_000
+    TRAIN_CACHE_TTL_SECONDS: float = 30.0
+    FLEET_SNAPSHOT_ENABLED: bool = True
+    FLEET_SNAPSHOT_PATH: str = "/tmp/jenfi-fleet.snapshot"
+    FLEET_SNAPSHOT_MAX_AGE_SECONDS: float = 60.0
+    FLEET_SNAPSHOT_DEBOUNCE_SECONDS: float = 0.2
+    MAX_ROUTE_LEGS: int = 3
+    MAX_ROUTE_ORIGINS: int = 1_000
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_HEADWAY_SECONDS: float = 300.0
+    SCHEDULER_LEAD_SECONDS: float = 60.0
+    SCHEDULER_BATCH_SIZE: int = 500
+    SCHEDULER_POLL_SECONDS: float = 30.0
+    MAX_SUBSCRIPTION_IDS: int = 1_000
+    SSE_QUEUE_SIZE: int = 100
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    SSE_RETRY_MILLISECONDS: int = 3_000
+    ENGINE_PROFILE: str = "dev"
+    ENGINE_PROFILES: Dict[str, Dict] = {
+        "dev": {
+            "echo": True,
+            "pool_size": 5,
+            "max_overflow": 10,
+            "pool_timeout": 30,
+            "pool_recycle": -1,
+            "pool_pre_ping": False,
+            "statement_cache_size": 100,
+        },
+        "bench": {
+            "echo": False,
+            "pool_size": 20,
+            "max_overflow": 0,
+            "pool_timeout": 10,
+            "pool_recycle": 1800,
+            "pool_pre_ping": False,
+            "statement_cache_size": 500,
+        },
+        "prod": {
+            "echo": False,
+            "pool_size": 20,
+            "max_overflow": 10,
+            "pool_timeout": 10,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+            "statement_cache_size": 500,
+        },
+    }
 
     class Config:
         env_file = ".env"
         from_attribute = True
 
+    @model_validator(mode="after")
+    def check_engine_profile(self):
+        if self.ENGINE_PROFILE not in self.ENGINE_PROFILES:
+            raise ValueError(
+                f"Unknown ENGINE_PROFILE {self.ENGINE_PROFILE!r}, expected one of: {', '.join(self.ENGINE_PROFILES)}"
+            )
+        return self
+
+    def engine_options(self) -> Dict:
+        """
+        Keyword arguments for `create_async_engine` built from the selected ENGINE_PROFILE.
+        """
+        profile = dict(self.ENGINE_PROFILES[self.ENGINE_PROFILE])
+        statement_cache_size = profile.pop("statement_cache_size")
+        return {**profile, "connect_args": {"prepared_statement_cache_size": statement_cache_size}}
+
 
 settings = DevelopConfig()
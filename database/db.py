@@ -1,17 +1,93 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from common.metrics import Histogram, counter, gauge, histogram, record_query, timed_dependency
 from config.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True, future=True)
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long every checkout waited for a connection and how many timed out.
+    """
+
+    checkout_wait = Histogram()
+    checkout_timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            InstrumentedPool.checkout_timeouts += 1
+            raise
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - start)
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL, future=True, poolclass=InstrumentedPool, **settings.engine_options()
+)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.statement_started_at = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    # Attributes the statement to the request being served (see common.metrics.MetricsMiddleware).
+    if context is not None:
+        record_query(statement, time.perf_counter() - context.statement_started_at)
+
+
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)  # noqa
 
 Base = declarative_base()
 
 
 async def get_db() -> Session:
-    async with SessionLocal() as session:
-        try:
-            yield session
-        finally:
-            session.close()
+    # An AsyncSession only checks a connection out of the pool on its first statement, so requests that
+    # never query (rejected by the role check or answered from cache) never touch the pool.
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        with timed_dependency("get_db"):
+            await session.close()
+
+
+def pool_stats() -> dict:
+    pool = engine.sync_engine.pool
+    return {
+        "profile": settings.ENGINE_PROFILE,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "checkout_timeouts": InstrumentedPool.checkout_timeouts,
+        "checkout_wait_seconds": InstrumentedPool.checkout_wait.snapshot(),
+    }
+
+
+def pool_metrics() -> list:
+    pool = engine.sync_engine.pool
+    return [
+        gauge("db_pool_size", "Configured number of pooled connections.", [({}, pool.size())]),
+        gauge("db_pool_checked_out", "Connections currently checked out.", [({}, pool.checkedout())]),
+        gauge("db_pool_overflow", "Connections open beyond the pool size.", [({}, max(pool.overflow(), 0))]),
+        counter(
+            "db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection.",
+            [({}, InstrumentedPool.checkout_timeouts)],
+        ),
+        histogram(
+            "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.",
+            [({}, InstrumentedPool.checkout_wait)],
+        ),
+    ]
@@ -1,4 +1,6 @@
 from database.db import Base, engine
+from models.backlog import DestinationBacklog
+from models.job import BookingJob
 from models.parcel import Parcel
 from models.train import Train
 from models.user import User
@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, String
+
+from database.db import Base
+
+
+class DestinationBacklog(Base):
+    """
+    Running totals of the parcels waiting for a train, per destination. Rows are adjusted in the same
+    transaction as every parcel creation, withdrawal and assignment.
+    """
+    __tablename__ = "destination_backlog"
+
+    destination = Column(String, primary_key=True)
+    pending_count = Column(Integer, nullable=False, default=0)
+    pending_weight = Column(Float, nullable=False, default=0)
+    pending_volume = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
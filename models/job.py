@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, ForeignKey, Enum, Integer, JSON
+
+from common.enums import JobStatus
+from models.base import BaseModel
+
+
+class BookingJob(BaseModel):
+    __tablename__ = "booking_jobs"
+
+    train_id = Column(String, ForeignKey("trains.id"), nullable=False)
+    requested_by = Column(String, ForeignKey("users.id"), nullable=False)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED, index=True)
+    parcels_assigned = Column(Integer, nullable=False, default=0)
+    # Incremented on every claim; only the run holding the latest attempt may update the job.
+    attempt = Column(Integer, nullable=False, default=0, server_default="0")
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
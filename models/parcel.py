@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, Boolean
+from sqlalchemy import Column, String, Float, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 
 from models.base import BaseModel
@@ -7,11 +7,24 @@ from models.train import Train
 
 class Parcel(BaseModel):
     __tablename__ = "parcels"
+    __table_args__ = (
+        Index(
+            "ix_parcels_unassigned",
+            "destination",
+            postgresql_include=["id", "weight", "volume"],
+            postgresql_where=text("train_id IS NULL"),
+        ),
+        Index("ix_parcels_owner_active", "owner_id", "created_at", "id", postgresql_where=text("is_active")),
+        Index("ix_parcels_train_id", "train_id", postgresql_where=text("train_id IS NOT NULL")),
+    )
 
     owner_id = Column(String, ForeignKey("users.id"), nullable=False)
     weight = Column(Float, nullable=False)
     volume = Column(Float, nullable=False)
     destination = Column(String, nullable=False)
+    # Only multi-leg routing (`POST /parcels/parcel_id/route`) boards at the origin. Single-train quotes and
+    # bookings match on the destination alone, as if the parcel could board any train.
+    origin = Column(String, nullable=True)
     has_shipped = Column(Boolean, nullable=False, default=False)
     train_id = Column(String, ForeignKey("trains.id"), nullable=True)
 
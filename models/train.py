@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Float, ForeignKey, Enum, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Float, ForeignKey, Enum, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import relationship, validates
 
 from common.enums import TrainStatus
 from models.base import BaseModel
@@ -7,6 +8,24 @@ from models.base import BaseModel
 
 class Train(BaseModel):
     __tablename__ = "trains"
+    __table_args__ = (
+        Index("ix_trains_lines", "lines", postgresql_using="gin"),
+        Index("ix_trains_status", "status", "created_at", "id"),
+        Index("ix_trains_operator_status", "operator_id", "status", "created_at", "id"),
+        Index(
+            "ix_trains_departures",
+            "departure_time",
+            "id",
+            postgresql_include=["assigned_line"],
+            postgresql_where=text("status = 'BOOKED'"),
+        ),
+        Index(
+            "ix_trains_sent_departures",
+            "departure_time",
+            postgresql_include=["assigned_line"],
+            postgresql_where=text("status = 'SENT'"),
+        ),
+    )
 
     operator_id = Column(String, ForeignKey("users.id"), nullable=False)
     weight_cost_factor = Column(Float, nullable=False)
@@ -17,9 +36,15 @@ class Train(BaseModel):
     current_weight = Column(Float, nullable=False, default=0)
     current_volume = Column(Float, nullable=False, default=0)
     available_lines = Column(String, nullable=False)
+    lines = Column(ARRAY(String), nullable=False, default=list, server_default="{}")
     assigned_line = Column(String, nullable=True)
     status = Column(Enum(TrainStatus), nullable=False)
     departure_time = Column(DateTime, nullable=True)
 
     train_operator = relationship("User", back_populates="trains")
     parcels = relationship("Parcel", back_populates="train")
+
+    @validates("available_lines")
+    def sync_lines(self, key, available_lines):
+        self.lines = available_lines.split(",") if available_lines else []
+        return available_lines
@@ -1,15 +1,32 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy import select, and_
 from sqlalchemy.orm import Session
 
 from common.authentication import decode_jwt
+from common.helpers import adjust_backlog, any_of, ingest_parcels, quote_parcels
+from common.ingest import iter_parcel_rows
+from common.pagination import json_rows, keyset, paginate, paginate_rows, stream_json_rows, stream_rows
 from common.enums import UserRole, TrainStatus
+from common.events import publish
+from common.fleet import FleetSnapshot, available_fleet, fleet_snapshots
+from common.routing import route_tables
+from common.subscriptions import status_hub
+from config.config import settings
 from database.db import get_db
 from models.parcel import Parcel
 from models.train import Train
-from schemas.parcel import ParcelCreate, ParcelResponse
+from schemas.parcel import (
+    ParcelCreate,
+    ParcelResponse,
+    ParcelQuoteRequest,
+    ParcelQuoteResponse,
+    ParcelBulkResponse,
+    ParcelRoute,
+    ParcelStatusRequest,
+    ParcelStatusResponse
+)
 
 parcel_router = APIRouter()
 
@@ -34,10 +51,37 @@ async def add_parcel_to_system(parcel: ParcelCreate, db: Session = Depends(get_d
         )
     db_parcel = Parcel(**parcel.model_dump(), owner_id=user.get("user_id"))
     db.add(db_parcel)
+    await adjust_backlog(db, [(parcel.destination, parcel.weight, parcel.volume)])
     await db.commit()  # noqa
     return db_parcel
 
 
+@parcel_router.post("/bulk", response_model=ParcelBulkResponse, status_code=status.HTTP_201_CREATED)
+async def add_parcels_in_bulk(request: Request, db: Session = Depends(get_db), user=Depends(decode_jwt)):
+    """
+    Add many parcels to the system from a streamed upload.
+
+    The request body is read incrementally as NDJSON (one ParcelCreate object per line) or, with a
+    `text/csv` content type, as CSV with a `weight,volume,destination` header. Valid rows are written in
+    chunks with COPY; invalid rows are reported and skipped.
+
+    Parameters:
+    - request (Request): The incoming request whose body is streamed.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Returns:
+    - ParcelBulkResponse: A Pydantic model summarizing inserted and rejected rows and the throughput.
+    """
+    if user.get("user_role") != UserRole.PARCEL_OWNER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized to add parcel to system"
+        )
+    rows = iter_parcel_rows(request.stream(), request.headers.get("content-type"))
+    return await ingest_parcels(db, user.get("user_id"), rows)
+
+
 @parcel_router.delete("/parcel_id", response_model=Dict, status_code=status.HTTP_200_OK)
 async def withdraw_parcel(parcel_id: str, db: Session = Depends(get_db), user=Depends(decode_jwt)):
     """
@@ -56,11 +100,12 @@ async def withdraw_parcel(parcel_id: str, db: Session = Depends(get_db), user=De
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User is not authorized to withdraw a parcel"
         )
+    # The row is locked so the train check below cannot race a booking assigning the parcel.
     query = await(db.execute(select(Parcel).where(and_(  # noqa
         Parcel.id == parcel_id,
         Parcel.owner_id == user.get("user_id"),
         Parcel.is_active
-    ))))
+    )).with_for_update()))
     db_parcel = query.scalars().one_or_none()
     if not db_parcel:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcel not found")
@@ -70,6 +115,8 @@ async def withdraw_parcel(parcel_id: str, db: Session = Depends(get_db), user=De
             detail="Cannot delete a parcel already assigned to a train"
         )
     db_parcel.is_active = False
+    await adjust_backlog(db, [(db_parcel.destination, db_parcel.weight, db_parcel.volume)], sign=-1)
+    await publish(db, "parcel", [{"id": parcel_id, "is_active": False}])
     await db.commit()  # noqa
     return {"message": f"parcel with ID:{parcel_id} has been withdrawn"}
 
@@ -105,10 +152,105 @@ async def has_parcel_shipped(parcel_id: str, db: Session = Depends(get_db), user
     return {"has_shipped": db_parcel.has_shipped}
 
 
+@parcel_router.post("/status", response_model=ParcelStatusResponse, status_code=status.HTTP_200_OK)
+async def have_parcels_shipped(
+        status_request: ParcelStatusRequest,
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
+    """
+    Check the shipping status of many parcels in one request.
+
+    Parameters:
+    - status_request (ParcelStatusRequest): The IDs of the parcels whose status is requested.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Returns:
+    - ParcelStatusResponse: The shipping status, train and train status of every parcel found, keyed by
+      parcel ID, and the requested IDs that match no active parcel of the user.
+    """
+    if user.get("user_role") != UserRole.PARCEL_OWNER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized to check shipping status"
+        )
+    parcel_ids = list(dict.fromkeys(status_request.parcel_ids))
+    if len(parcel_ids) > settings.MAX_STATUS_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.MAX_STATUS_BATCH_SIZE} parcels can be checked at once"
+        )
+
+    parcels = await db.execute(  # noqa
+        select(Parcel.id, Parcel.has_shipped, Parcel.train_id, Train.status)
+        .outerjoin(Train, Train.id == Parcel.train_id)
+        .where(any_of(Parcel.id, parcel_ids), Parcel.owner_id == user.get("user_id"), Parcel.is_active)
+    )
+    statuses = {
+        parcel_id: {"has_shipped": has_shipped, "train_id": train_id, "train_status": train_status}
+        for parcel_id, has_shipped, train_id, train_status in parcels.all()
+    }
+    return {
+        "statuses": statuses,
+        "missing": [parcel_id for parcel_id in parcel_ids if parcel_id not in statuses],
+    }
+
+
+@parcel_router.get("/events", status_code=status.HTTP_200_OK)
+async def follow_parcel_status(
+        ids: List[str] = Query([]),
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
+    """
+    Follow the status of many parcels as Server-Sent Events instead of polling each one.
+
+    The stream starts with one `parcel` event per followed parcel holding its full status, then sends a
+    `parcel` event with the parcel's `id` and only the changed fields whenever it is assigned to a train,
+    shipped or withdrawn. When the stream ends the client should reconnect, which sends a fresh snapshot.
+
+    Parameters:
+    - ids (List[str]): The IDs of the parcels to follow; IDs of parcels the user does not own are ignored.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Returns:
+    - StreamingResponse: A `text/event-stream` of parcel status events.
+    """
+    if user.get("user_role") != UserRole.PARCEL_OWNER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized to check shipping status"
+        )
+    if not ids or len(ids) > settings.MAX_SUBSCRIPTION_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Between 1 and {settings.MAX_SUBSCRIPTION_IDS} parcels can be followed at once"
+        )
+
+    async def snapshot():
+        parcels = await db.execute(  # noqa
+            select(Parcel.id, Parcel.has_shipped, Parcel.train_id, Parcel.is_active).where(
+                any_of(Parcel.id, ids), Parcel.owner_id == user.get("user_id"), Parcel.is_active
+            )
+        )
+        parcels = parcels.mappings().all()
+        # Release the connection: the stream may stay open for hours.
+        await db.close()
+        return [dict(parcel) for parcel in parcels]
+
+    stream = await status_hub.open("parcel", ids, snapshot)
+    if stream is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcel not found")
+    return stream
+
+
 @parcel_router.post("/parcel_id/cost", response_model=Dict, status_code=status.HTTP_200_OK)
 async def get_minimal_shipping_cost(parcel_id: str, db: Session = Depends(get_db), user=Depends(decode_jwt)):
     """
-    Calculate the minimal cost of shipping for a given parcel.
+    Calculate the minimal cost of shipping for a given parcel on a single train serving its destination.
+    The parcel's origin is not taken into account; see `/parcel_id/route` for routes from the origin.
 
     Parameters:
     - parcel_id (str): The ID of the parcel for which the shipping status is requested.
@@ -134,33 +276,135 @@ async def get_minimal_shipping_cost(parcel_id: str, db: Session = Depends(get_db
     if not db_parcel:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcel not found")
 
-    available_trains = await db.execute(select(Train).where(Train.status == TrainStatus.AVAILABLE))  # noqa
-    available_trains = available_trains.scalars().all()
+    snapshot = fleet_snapshots.current()
+    if snapshot is not None:
+        cheapest_train = snapshot.cheapest(db_parcel.weight, db_parcel.volume, db_parcel.destination)
+    else:
+        shipping_cost = Train.weight_cost_factor * db_parcel.weight + Train.volume_cost_factor * db_parcel.volume
+        cheapest_train = await db.execute(  # noqa
+            select(Train.id, shipping_cost)
+            .where(Train.status == TrainStatus.AVAILABLE, Train.lines.contains([db_parcel.destination]))
+            .order_by(shipping_cost)
+            .limit(1)
+        )
+        cheapest_train = cheapest_train.first()
+
+    if not cheapest_train:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Trains are currently unavailable"
+        )
+
+    by_train, min_cost = cheapest_train
+    return {"minimal_shipping_cost": min_cost, "by_train": by_train}
 
-    min_cost = float('inf')
-    by_train = None
 
-    for train in available_trains:
-        cost = db_parcel.calculate_shipping_cost(train)
-        if cost < min_cost and db_parcel.destination in train.available_lines.split(','):
-            min_cost = cost
-            by_train = train
+@parcel_router.post("/parcel_id/route", response_model=ParcelRoute, status_code=status.HTTP_200_OK)
+async def get_cheapest_route(parcel_id: str, db: Session = Depends(get_db), user=Depends(decode_jwt)):
+    """
+    Find the cheapest route for a parcel from its origin to its destination, changing trains at
+    interchanges when no single train serves both.
 
-    if not by_train:
+    Parameters:
+    - parcel_id (str): The ID of the parcel to be routed.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Returns:
+    - ParcelRoute: The total cost and, for every leg, the train, the lines it runs between and its cost.
+    """
+    if user.get("user_role") != UserRole.PARCEL_OWNER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized"
+        )
+
+    query = await db.execute(select(Parcel).where(and_(  # noqa
+        Parcel.id == parcel_id,
+        Parcel.owner_id == user.get("user_id"),
+        Parcel.is_active
+    )))
+    db_parcel = query.scalars().one_or_none()
+
+    if not db_parcel:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcel not found")
+
+    snapshot = fleet_snapshots.current()
+    if snapshot is None:
+        trains = await db.execute(available_fleet())  # noqa
+        snapshot = FleetSnapshot.build(trains.all(), version=0)
+    route_tables.refresh(snapshot)
+    route = await route_tables.quote(db_parcel.origin, db_parcel.destination, db_parcel.weight, db_parcel.volume)
+
+    if route is None:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Trains are currently unavailable"
+            detail="No route to the destination with the available trains"
+        )
+
+    total_cost, legs = route
+    return {
+        "parcel_id": db_parcel.id,
+        "origin": db_parcel.origin,
+        "destination": db_parcel.destination,
+        "total_cost": total_cost,
+        "legs": legs,
+    }
+
+
+@parcel_router.post("/quotes", response_model=ParcelQuoteResponse, status_code=status.HTTP_200_OK)
+async def get_minimal_shipping_costs(
+        quote_request: ParcelQuoteRequest,
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
+    """
+    Calculate the minimal cost of shipping for many parcels at once, each on a single train serving its
+    destination, regardless of origin.
+
+    Parameters:
+    - quote_request (ParcelQuoteRequest): The IDs of stored parcels and/or ad-hoc parcel details to be quoted.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Returns:
+    - ParcelQuoteResponse: One quote per requested parcel, stored parcels first and in request order.
+    """
+    if user.get("user_role") != UserRole.PARCEL_OWNER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized"
+        )
+    if len(quote_request.parcel_ids) + len(quote_request.parcels) > settings.MAX_QUOTE_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.MAX_QUOTE_BATCH_SIZE} parcels can be quoted at once"
         )
 
-    return {"minimal_shipping_cost": min_cost, "by_train": by_train.id}
+    quotes = await quote_parcels(db, user.get("user_id"), quote_request.parcel_ids, quote_request.parcels)
+    return {"quotes": quotes}
 
 
 @parcel_router.get("", response_model=List[ParcelResponse], status_code=status.HTTP_200_OK)
-async def get_parcels_for_owner(db: Session = Depends(get_db), user=Depends(decode_jwt)):
+async def get_parcels_for_owner(
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+        after: Optional[str] = None,
+        stream: bool = False,
+        fast: bool = False,
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
     """
     Get a list of parcels for the authenticated parcel owner.
 
     Parameters:
+    - response (Response): The outgoing response, used to return the X-Next-Cursor header.
+    - limit (int): Optional page size; when the page is full the next page's cursor is returned in X-Next-Cursor.
+    - after (str): Optional cursor from a previous page's X-Next-Cursor header.
+    - stream (bool): When true, the parcels are streamed as a JSON array through a server-side cursor.
+    - fast (bool): When true, rows are built straight from the selected columns and encoded with orjson,
+      skipping response model validation.
     - db (Session): The database session dependency obtained using FastAPI's dependency injection.
     - user (dict): The user information obtained from the JWT token. Used to identify the parcel owner.
 
@@ -172,10 +416,18 @@ async def get_parcels_for_owner(db: Session = Depends(get_db), user=Depends(deco
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User is not authorized"
         )
-    query = await db.execute(select(Parcel).where(Parcel.owner_id == user.get("user_id"), Parcel.is_active))  # noqa
-    db_parcels = query.scalars().all()
-
-    if not db_parcels:
+    query = select(Parcel).where(Parcel.owner_id == user.get("user_id"), Parcel.is_active)
+    if stream:
+        if fast:
+            return stream_json_rows(keyset(query, Parcel, limit, after), Parcel, ParcelResponse)
+        return stream_rows(keyset(query, Parcel, limit, after), ParcelResponse)
+
+    if fast:
+        db_parcels = await paginate_rows(db, query, Parcel, ParcelResponse, response, limit, after)
+    else:
+        db_parcels = await paginate(db, query, Parcel, response, limit, after)
+
+    if not db_parcels and not after:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No parcels found for the owner")
 
-    return db_parcels
+    return json_rows(db_parcels, response) if fast else db_parcels
@@ -1,32 +1,59 @@
-from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
 from sqlalchemy import select, and_
 from sqlalchemy.orm import Session, selectinload
 
 from common.authentication import decode_jwt
+from common.cache import train_cache
 from common.enums import UserRole, TrainStatus
-from common.helpers import assign_parcels_to_train
+from common.events import publish
+from common.helpers import NOTHING_TO_SHIP, any_of, book_fill_send, plan_parcels_for_fleet
+from common.jobs import booking_workers
+from common.pagination import json_rows, keyset, paginate, paginate_rows, stream_json_rows, stream_rows
+from common.scheduler import departure_scheduler
+from common.subscriptions import status_hub
+from config.config import settings
 from database.db import get_db
-from models.parcel import Parcel
+from models.backlog import DestinationBacklog
+from models.job import BookingJob
 from models.train import Train
 from schemas.train import (
     TrainCreate,
     TrainResponse,
     TrainStatusResponse,
-    TrainCapacityCostResponse
+    TrainCapacityCostResponse,
+    TrainPlanResponse,
+    BacklogDashboardResponse,
+    BookingJobAccepted,
+    BookingJobResponse,
+    TrainSchedule
 )
 
 train_router = APIRouter()
 
 
 @train_router.get("/available", response_model=List[TrainResponse], status_code=status.HTTP_200_OK)
-async def get_available_trains(db: Session = Depends(get_db), user=Depends(decode_jwt)):
+async def get_available_trains(
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+        after: Optional[str] = None,
+        stream: bool = False,
+        fast: bool = False,
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
     """
     Retrieve a list of available trains.
 
     Parameters:
+    - response (Response): The outgoing response, used to return the X-Next-Cursor header.
+    - limit (int): Optional page size; when the page is full the next page's cursor is returned in X-Next-Cursor.
+    - after (str): Optional cursor from a previous page's X-Next-Cursor header.
+    - stream (bool): When true, the trains are streamed as a JSON array through a server-side cursor.
+    - fast (bool): When true, rows are built straight from the selected columns and encoded with orjson,
+      skipping response model validation.
     - db (Session): The database session dependency obtained using FastAPI's dependency injection.
     - user (dict): The user information obtained from the JWT token. Used to check the user's role.
 
@@ -38,14 +65,22 @@ async def get_available_trains(db: Session = Depends(get_db), user=Depends(decod
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User is not authorized to view available trains"
         )
-    query = await db.execute(select(Train).where(and_(  # noqa
+    query = select(Train).where(and_(
         Train.operator_id == user.get("user_id"),
         Train.status == TrainStatus.AVAILABLE
-    )))
-    db_trains = query.scalars().all()
-    if not db_trains:
+    ))
+    if stream:
+        if fast:
+            return stream_json_rows(keyset(query, Train, limit, after), Train, TrainResponse)
+        return stream_rows(keyset(query, Train, limit, after), TrainResponse)
+
+    if fast:
+        db_trains = await paginate_rows(db, query, Train, TrainResponse, response, limit, after)
+    else:
+        db_trains = await paginate(db, query, Train, response, limit, after)
+    if not db_trains and not after:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Train not found")
-    return db_trains
+    return json_rows(db_trains, response) if fast else db_trains
 
 
 @train_router.get("/train_id/capacity-cost", response_model=TrainCapacityCostResponse, status_code=status.HTTP_200_OK)
@@ -66,6 +101,13 @@ async def get_train_capacity_cost(train_id: str, db: Session = Depends(get_db),
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User is not authorized"
         )
+    cached = train_cache.get(train_id, "capacity-cost")
+    if cached is not None:
+        operator_id, capacity_cost = cached
+        if operator_id != user.get("user_id"):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Train not found")
+        return capacity_cost
+
     train = await db.execute(select(Train).where(and_(  # noqa
         Train.operator_id == user.get("user_id"),
         Train.id == train_id
@@ -75,16 +117,15 @@ async def get_train_capacity_cost(train_id: str, db: Session = Depends(get_db),
     if not db_train:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Train not found")
 
-    current_cost = (db_train.current_weight * db_train.weight_cost_factor) + (
-            db_train.current_volume * db_train.volume_cost_factor
-    )
-    return {
+    capacity_cost = {
         "current_capacity": {
             "current_weight": db_train.current_weight,
             "current_volume": db_train.current_volume
         },
-        "current_cost": current_cost
+        "current_cost": db_train.cost or 0
     }
+    train_cache.set(train_id, "capacity-cost", (db_train.operator_id, capacity_cost))
+    return capacity_cost
 
 
 @train_router.get("/rail-lines", response_model=Dict, status_code=status.HTTP_200_OK)
@@ -104,15 +145,15 @@ async def get_operable_rail_lines(db: Session = Depends(get_db), user=Depends(de
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User is not authorized"
         )
-    query = await db.execute(select(Train).where(and_(  # noqa
+    query = await db.execute(select(Train.lines).where(and_(  # noqa
         Train.operator_id == user.get("user_id"),
         Train.is_active
     )))
-    db_trains = query.scalars().all()
-    if not db_trains:
+    operable_lines = query.scalars().all()
+    if not operable_lines:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Train not found")
 
-    return {"operable_lines": [train.available_lines for train in db_trains if train.available_lines]}
+    return {"operable_lines": [",".join(lines) for lines in operable_lines if lines]}
 
 
 @train_router.get("/train_id/status", response_model=TrainStatusResponse, status_code=status.HTTP_200_OK)
@@ -134,6 +175,10 @@ async def get_train_status(train_id: str, db: Session = Depends(get_db), user=De
             detail="User is not authorized to view train status"
         )
 
+    train_status = train_cache.get(train_id, "status")
+    if train_status is not None:
+        return train_status
+
     query = (
         await db.execute(  # noqa
             select(Train)
@@ -160,9 +205,66 @@ async def get_train_status(train_id: str, db: Session = Depends(get_db), user=De
             for parcel in db_train.parcels
         ] if db_train.status == TrainStatus.AVAILABLE else None
     }
+    train_cache.set(train_id, "status", train_status)
     return train_status
 
 
+@train_router.get("/events", status_code=status.HTTP_200_OK)
+async def follow_train_status(
+        ids: List[str] = Query([]),
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
+    """
+    Follow the status of many trains as Server-Sent Events instead of polling each one.
+
+    The stream starts with one `train` event per followed train holding its status, assigned line and
+    departure time, then sends a `train` event with the train's `id` and only the changed fields whenever
+    it is booked, scheduled, sent or withdrawn. When the stream ends the client should reconnect, which
+    sends a fresh snapshot.
+
+    Parameters:
+    - ids (List[str]): The IDs of the trains to follow; unknown IDs are ignored.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Returns:
+    - StreamingResponse: A `text/event-stream` of train status events.
+    """
+    if user.get("user_role") != UserRole.TRAIN_OPERATOR:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized to view train status"
+        )
+    if not ids or len(ids) > settings.MAX_SUBSCRIPTION_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Between 1 and {settings.MAX_SUBSCRIPTION_IDS} trains can be followed at once"
+        )
+
+    async def snapshot():
+        trains = await db.execute(  # noqa
+            select(Train.id, Train.status, Train.assigned_line, Train.departure_time).where(any_of(Train.id, ids))
+        )
+        trains = trains.all()
+        # Release the connection: the stream may stay open for hours.
+        await db.close()
+        return [
+            {
+                "id": train.id,
+                "status": train.status,
+                "assigned_line": train.assigned_line,
+                "departure_time": train.departure_time.strftime("%Y-%m-%d %H:%M:%S") if train.departure_time else None,
+            }
+            for train in trains
+        ]
+
+    stream = await status_hub.open("train", ids, snapshot)
+    if stream is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Train not found")
+    return stream
+
+
 @train_router.get("/train_id", response_model=TrainResponse, status_code=status.HTTP_200_OK)
 async def get_train(train_id: str, db: Session = Depends(get_db), user=Depends(decode_jwt)):
     """
@@ -191,23 +293,38 @@ async def withdraw_offer(train_id: str, db: Session = Depends(get_db), user=Depe
     Parameters:
     - train_id (str): The ID of the train to be deleted.
     - db (Session): The database session dependency obtained using FastAPI's dependency injection.
-    - user (dict): The user information obtained from the JWT token.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Raises:
+    - HTTPException with a 401 status code if the user is not authorized as a Train Operator.
 
     Returns:
     - None: Returns a 204 status code if the train is successfully deleted.
     """
-    query = await db.execute(select(Train).where(Train.id == train_id))  # noqa
+    if user.get("user_role") != UserRole.TRAIN_OPERATOR:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized as a Train Operator"
+        )
+    # The row is locked so a booking or departure committing meanwhile is not overwritten.
+    query = await db.execute(  # noqa
+        select(Train)
+        .where(Train.id == train_id, Train.operator_id == user.get("user_id"))
+        .with_for_update()
+    )
     db_train = query.scalars().one_or_none()
     if not db_train:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Train not found")
-    if db_train.status != "available":
+    if db_train.status != TrainStatus.AVAILABLE:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete a train that is not available"
         )
     db_train.is_active = False
     db_train.status = TrainStatus.UNAVAILABLE
+    await publish(db, "train", [{"id": train_id, "status": db_train.status}])
     await db.commit()  # noqa
+    train_cache.invalidate(train_id)
     return {"message": f"train with ID:{train_id} has been withdrawn"}
 
 
@@ -241,11 +358,25 @@ async def train_operator_post_offer(train_data: TrainCreate, db: Session = Depen
 
 
 @train_router.get("/all", response_model=List[TrainResponse], status_code=status.HTTP_200_OK)
-async def get_all_trains(db: Session = Depends(get_db), user=Depends(decode_jwt)):
+async def get_all_trains(
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+        after: Optional[str] = None,
+        stream: bool = False,
+        fast: bool = False,
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
     """
     Retrieve a list of available trains.
 
     Parameters:
+    - response (Response): The outgoing response, used to return the X-Next-Cursor header.
+    - limit (int): Optional page size; when the page is full the next page's cursor is returned in X-Next-Cursor.
+    - after (str): Optional cursor from a previous page's X-Next-Cursor header.
+    - stream (bool): When true, the trains are streamed as a JSON array through a server-side cursor.
+    - fast (bool): When true, rows are built straight from the selected columns and encoded with orjson,
+      skipping response model validation.
     - db (Session): The database session dependency obtained using FastAPI's dependency injection.
     - user (dict): The user information obtained from the JWT token. Used to check the user's role.
 
@@ -257,30 +388,57 @@ async def get_all_trains(db: Session = Depends(get_db), user=Depends(decode_jwt)
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User is not authorized as a Post Master"
         )
-    query = await db.execute(select(Train).where(and_(  # noqa
+    query = select(Train).where(and_(
         Train.status == TrainStatus.AVAILABLE
-    )))
-    db_trains = query.scalars().all()
-    if not db_trains:
+    ))
+    if stream:
+        if fast:
+            return stream_json_rows(keyset(query, Train, limit, after), Train, TrainResponse)
+        return stream_rows(keyset(query, Train, limit, after), TrainResponse)
+
+    if fast:
+        db_trains = await paginate_rows(db, query, Train, TrainResponse, response, limit, after)
+    else:
+        db_trains = await paginate(db, query, Train, response, limit, after)
+    if not db_trains and not after:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Train not found")
-    return db_trains
+    return json_rows(db_trains, response) if fast else db_trains
 
 
-@train_router.post("/train_id/book-fill-send", response_model=TrainResponse, status_code=status.HTTP_201_CREATED)
-async def post_master_book_fill_send(train_id: str, db: Session = Depends(get_db), user=Depends(decode_jwt)):
+@train_router.post(
+    "/train_id/book-fill-send",
+    response_model=TrainResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        status.HTTP_202_ACCEPTED: {"model": BookingJobAccepted, "description": "Booking job queued"},
+        status.HTTP_409_CONFLICT: {"description": NOTHING_TO_SHIP},
+    },
+)
+async def post_master_book_fill_send(
+        train_id: str,
+        async_mode: bool = False,
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
     """
-    Post Master books, fills, and sends a train.
+    Post Master books, fills, and sends a train. The booked train is handed to the departure scheduler, which
+    assigns its line and departure time and sends it when its slot comes up.
 
     Parameters:
     - train_id (str): The ID of the train to be booked, filled, and sent.
+    - async_mode (bool): When true, the booking is queued for the background workers and a 202 response with
+      the job ID is returned immediately; poll GET /trains/jobs/{job_id} for progress and the result.
     - db (Session): The database session dependency obtained using FastAPI's dependency injection.
     - user (dict): The user information obtained from the JWT token. Used to check the user's role.
 
     Raises:
     - HTTPException with a 401 status code if the user is not authorized as a Post Master.
+    - HTTPException with a 409 status code if no unassigned parcel fits on the train, which stays available.
+      In async mode the job fails with the same message.
 
     Returns:
-    - TrainResponse: A Pydantic model containing information about the booked, filled, and sent train.
+    - TrainResponse: A Pydantic model containing information about the booked, filled, and sent train, or in
+      async mode a BookingJobAccepted with the queued job's ID and status.
     """
     if user.get("user_role") != UserRole.POST_MASTER:
         raise HTTPException(
@@ -288,28 +446,154 @@ async def post_master_book_fill_send(train_id: str, db: Session = Depends(get_db
             detail="User is not authorized as a Post Master"
         )
 
-    train_offer = await db.execute(select(Train).where(and_(  # noqa
+    train_offer = select(Train).where(and_(
         Train.id == train_id,
         Train.operator_id != user.get("user_id"),
         Train.status == TrainStatus.AVAILABLE
-    )))
+    ))
+    if not async_mode:
+        train_offer = train_offer.with_for_update()
+    train_offer = await db.execute(train_offer)  # noqa
     db_train_offer = train_offer.scalars().first()
 
     if not db_train_offer:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Train offer not found or not available")
 
-    await assign_parcels_to_train(db, db_train_offer)
+    if async_mode:
+        job = BookingJob(train_id=train_id, requested_by=user.get("user_id"))
+        db.add(job)
+        await db.commit()  # noqa
+        booking_workers.notify()
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=BookingJobAccepted(job_id=job.id, status=job.status).model_dump(mode="json"),
+        )
 
-    assigned_parcels = await db.execute(select(Parcel).where(Parcel.train_id == train_id))  # noqa
-    assigned_parcels = assigned_parcels.scalars().all()
+    if not await book_fill_send(db, db_train_offer):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=NOTHING_TO_SHIP)
+    departure_scheduler.notify()
+    return db_train_offer
 
-    for parcel in assigned_parcels:
-        db_train_offer.current_weight += parcel.weight
-        db_train_offer.current_volume += parcel.volume
 
-    db_train_offer.status = TrainStatus.SENT
-    db_train_offer.departure_time = datetime.now()
+@train_router.get("/jobs/{job_id}", response_model=BookingJobResponse, status_code=status.HTTP_200_OK)
+async def get_booking_job(job_id: str, db: Session = Depends(get_db), user=Depends(decode_jwt)):
+    """
+    Get the progress and result of an asynchronous book-fill-send job.
 
-    await db.commit()  # noqa
+    Parameters:
+    - job_id (str): The ID of the job returned when the booking was queued.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
 
-    return db_train_offer
+    Returns:
+    - BookingJobResponse: A Pydantic model containing the job status, progress, and result or error.
+    """
+    if user.get("user_role") != UserRole.POST_MASTER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized as a Post Master"
+        )
+    query = await db.execute(select(BookingJob).where(and_(  # noqa
+        BookingJob.id == job_id,
+        BookingJob.requested_by == user.get("user_id")
+    )))
+    db_job = query.scalars().one_or_none()
+    if not db_job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return db_job
+
+
+@train_router.post("/plan", response_model=TrainPlanResponse, status_code=status.HTTP_200_OK)
+async def post_master_plan_fleet(dry_run: bool = False, db: Session = Depends(get_db), user=Depends(decode_jwt)):
+    """
+    Post Master plans the whole available fleet against the unassigned parcel backlog in one pass.
+
+    Parameters:
+    - dry_run (bool): When true, the plan is returned without assigning any parcel.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Raises:
+    - HTTPException with a 401 status code if the user is not authorized as a Post Master.
+
+    Returns:
+    - TrainPlanResponse: A Pydantic model containing the parcels planned for every train.
+    """
+    if user.get("user_role") != UserRole.POST_MASTER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized as a Post Master"
+        )
+
+    plan = await plan_parcels_for_fleet(db, user.get("user_id"), dry_run)
+    if not dry_run and plan["assignments"]:
+        departure_scheduler.notify()
+    return plan
+
+
+@train_router.get("/schedule", response_model=List[TrainSchedule], status_code=status.HTTP_200_OK)
+async def get_departure_schedule(
+        line: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+        db: Session = Depends(get_db),
+        user=Depends(decode_jwt)
+):
+    """
+    Get the upcoming departures, earliest first.
+
+    Parameters:
+    - line (str): Optional line to restrict the schedule to.
+    - limit (int): The number of departures to return.
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Returns:
+    - A list of TrainSchedule objects with the train, its assigned line and its departure time.
+    """
+    if user.get("user_role") != UserRole.POST_MASTER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized as a Post Master"
+        )
+    query = select(
+        Train.id.label("train_id"),
+        Train.departure_time.label("estimated_departure_time"),
+        Train.assigned_line,
+    ).where(Train.status == TrainStatus.BOOKED, Train.departure_time.is_not(None))
+    if line:
+        query = query.where(Train.assigned_line == line)
+    departures = await db.execute(query.order_by(Train.departure_time, Train.id).limit(limit))  # noqa
+    return departures.mappings().all()
+
+
+@train_router.get("/dashboard", response_model=BacklogDashboardResponse, status_code=status.HTTP_200_OK)
+async def get_backlog_dashboard(db: Session = Depends(get_db), user=Depends(decode_jwt)):
+    """
+    Get the parcel backlog waiting for a train, per destination and in total.
+
+    The figures come from the maintained per-destination summary, so the cost does not grow with the number
+    of parcels.
+
+    Parameters:
+    - db (Session): The database session dependency obtained using FastAPI's dependency injection.
+    - user (dict): The user information obtained from the JWT token. Used to check the user's role.
+
+    Returns:
+    - BacklogDashboardResponse: A Pydantic model containing the pending parcel count, weight and volume.
+    """
+    if user.get("user_role") != UserRole.POST_MASTER:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is not authorized as a Post Master"
+        )
+    query = await db.execute(  # noqa
+        select(DestinationBacklog).where(DestinationBacklog.pending_count > 0).order_by(DestinationBacklog.destination)
+    )
+    destinations = query.scalars().all()
+
+    return {
+        "destinations": destinations,
+        "pending_count": sum(destination.pending_count for destination in destinations),
+        "pending_weight": sum(destination.pending_weight for destination in destinations),
+        "pending_volume": sum(destination.pending_volume for destination in destinations),
+    }
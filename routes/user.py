@@ -56,7 +56,7 @@ async def login(username: str, password: str, db: Session = Depends(get_db)):
     """
     user = await get_user_by_username(db, username)
 
-    if not user or not verify_password(password, user.password):
+    if not user or not await verify_password(password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
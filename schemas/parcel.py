@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -7,6 +8,7 @@ class ParcelCreate(BaseModel):
     weight: float
     volume: float
     destination: str
+    origin: Optional[str] = None
     # has_shipped: bool = False
 
 
@@ -16,3 +18,63 @@ class ParcelResponse(ParcelCreate):
     created_at: datetime
     updated_at: datetime
     is_active: bool
+
+
+class ParcelQuoteRequest(BaseModel):
+    parcel_ids: List[str] = []
+    parcels: List[ParcelCreate] = []
+
+
+class ParcelQuote(BaseModel):
+    parcel_id: Optional[str]
+    minimal_shipping_cost: Optional[float]
+    by_train: Optional[str]
+    detail: Optional[str]
+
+
+class ParcelQuoteResponse(BaseModel):
+    quotes: List[ParcelQuote]
+
+
+class ParcelStatusRequest(BaseModel):
+    parcel_ids: List[str]
+
+
+class ParcelStatus(BaseModel):
+    has_shipped: bool
+    train_id: Optional[str]
+    train_status: Optional[str]
+
+
+class ParcelStatusResponse(BaseModel):
+    statuses: Dict[str, ParcelStatus]
+    missing: List[str]
+
+
+class RouteLeg(BaseModel):
+    train_id: str
+    from_line: Optional[str]
+    to_line: str
+    cost: float
+
+
+class ParcelRoute(BaseModel):
+    parcel_id: str
+    origin: Optional[str]
+    destination: str
+    total_cost: float
+    legs: List[RouteLeg]
+
+
+class ParcelRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ParcelBulkResponse(BaseModel):
+    received: int
+    inserted: int
+    rejected: int
+    errors: List[ParcelRowError]
+    elapsed_seconds: float
+    rows_per_second: float
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
-from common.enums import TrainStatus
+from typing import Optional, List, Dict
+from common.enums import JobStatus, TrainStatus
 
 
 class TrainCreate(BaseModel):
@@ -49,3 +49,48 @@ class TrainCapacity(BaseModel):
 class TrainCapacityCostResponse(BaseModel):
     current_capacity: TrainCapacity
     current_cost: float
+
+
+class TrainPlanEntry(BaseModel):
+    train_id: str
+    parcel_ids: List[str]
+    weight: float
+    volume: float
+    cost: float
+
+
+class TrainPlanResponse(BaseModel):
+    dry_run: bool
+    truncated: bool
+    assignments: List[TrainPlanEntry]
+    unassigned_parcels: int
+
+
+class DestinationBacklogResponse(BaseModel):
+    destination: str
+    pending_count: int
+    pending_weight: float
+    pending_volume: float
+
+
+class BacklogDashboardResponse(BaseModel):
+    destinations: List[DestinationBacklogResponse]
+    pending_count: int
+    pending_weight: float
+    pending_volume: float
+
+
+class BookingJobAccepted(BaseModel):
+    job_id: str
+    status: JobStatus
+
+
+class BookingJobResponse(BaseModel):
+    id: str
+    train_id: str
+    status: JobStatus
+    parcels_assigned: int
+    result: Optional[Dict]
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime